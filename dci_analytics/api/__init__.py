@@ -38,3 +38,4 @@ import dci_analytics.api.junit  # noqa
 import dci_analytics.api.pipelines  # noqa
 import dci_analytics.api.synchronization  # noqa
 import dci_analytics.api.jobs  # noqa
+import dci_analytics.api.stats  # noqa
@@ -45,7 +45,10 @@ def get_jobs():
     elif not _jobs["hits"]["hits"]:
         _jobs = {}
 
-    _jobs["_meta"] = es.get_index_meta(latest_index_alias)
+    meta = es.get_index_meta(latest_index_alias) or {}
+    # the mapping version is internal to the synchronizations
+    meta.pop("mapping_version", None)
+    _jobs["_meta"] = meta
     return flask.Response(
         json.dumps(_jobs),
         status=200,
@@ -60,7 +60,6 @@ def filter_jobs(jobs, file_test_name):
 
 def get_jobs_dataset(topic_id, start_date, end_date, remoteci_id, tags, test_name):
     jobs_dataframes = []
-    size = 5
     body = {
         "query": {
             "bool": {
@@ -71,8 +70,6 @@ def get_jobs_dataset(topic_id, start_date, end_date, remoteci_id, tags, test_nam
                 ]
             }
         },
-        "from": 0,
-        "size": size,
         "sort": [
             {
                 "created_at": {
@@ -86,21 +83,16 @@ def get_jobs_dataset(topic_id, start_date, end_date, remoteci_id, tags, test_nam
         for t in tags:
             body["query"]["bool"]["must"].append({"term": {"tags": t}})
 
-    while True:
-        jobs = es.search_json("tasks_junit", body)
-        if "hits" not in jobs:
-            break
-        if not jobs["hits"]:
-            break
-        if "hits" not in jobs["hits"]:
-            break
-        jobs = jobs["hits"]["hits"]
-        jobs = filter_jobs(jobs, test_name)
-        for j in jobs:
-            if j["junit_content"]:
-                df = pd.DataFrame(j["junit_content"], index=[j["id"]])
-                jobs_dataframes.append(df)
-        body["from"] += size
+    jobs = es.search_iter(
+        "tasks_junit",
+        body,
+        source_includes=["id", "created_at", "files.name", "files.junit_content"],
+    )
+    jobs = filter_jobs(jobs, test_name)
+    for j in jobs:
+        if j["junit_content"]:
+            df = pd.DataFrame(j["junit_content"], index=[j["id"]])
+            jobs_dataframes.append(df)
 
     if not jobs_dataframes:
         return None, None
@@ -73,7 +73,6 @@ def pipelines_status():
     pipelines_names = flask.request.json.get("pipelines_names", [])
     teams_ids = flask.request.json.get("teams_ids", [])
     components_types = flask.request.json.get("components_types", [])
-    size = 10
     body = {
         "query": {
             "bool": {
@@ -86,8 +85,6 @@ def pipelines_status():
                 ]
             }
         },
-        "from": 0,
-        "size": size,
         "sort": [
             {
                 "created_at": {
@@ -114,25 +111,14 @@ def pipelines_status():
             )
         body["query"]["bool"]["must"].append(pipeline_name_should_query)
 
-    jobs = []
-    while True:
-        _jobs = es.search_json("pipelines_status", body)
-        if "hits" not in _jobs:
-            break
-        if "hits" not in _jobs["hits"]:
-            break
-        if not _jobs["hits"]["hits"]:
-            break
-        for j in _jobs["hits"]["hits"]:
-            if "files" in j["_source"]:
-                j["_source"].pop("files")
-            if "jobstates" in j["_source"]:
-                j["_source"].pop("jobstates")
-            for c in j["_source"]["components"]:
-                if "data" in c:
-                    c.pop("data")
-            jobs.append(j["_source"])
-        body["from"] += size
+    jobs = [
+        j["_source"]
+        for j in es.search_iter(
+            "pipelines_status",
+            body,
+            source_excludes=["files", "jobstates", "components.data"],
+        )
+    ]
 
     def _get_components_headers(jobs, components_types):
         headers = []
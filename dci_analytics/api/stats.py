@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import flask
+
+import json
+import logging
+
+from dci_analytics.api import api
+from dci_analytics import dci_db
+from dci_analytics import elasticsearch as es
+from dci_analytics import junit_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+@api.route("/stats", strict_slashes=False, methods=["GET"])
+def get_stats():
+    return flask.Response(
+        json.dumps(
+            {
+                "elasticsearch": es.get_pool_stats(),
+                "database": dci_db.get_pool_stats(),
+                "junit_cache": junit_cache.get_stats(),
+            }
+        ),
+        status=200,
+        content_type="application/json",
+    )
@@ -36,6 +36,8 @@ _LOCK_PIPELINES_partial = threading.Lock()
 _LOCK_PIPELINES_full = threading.Lock()
 _LOCK_JOBS_full = threading.Lock()
 _LOCK_JOBS_partial = threading.Lock()
+_LOCK_FANOUT_full = threading.Lock()
+_LOCK_FANOUT_partial = threading.Lock()
 
 _LOCKS = {
     "duration_cumulated_partial": _LOCK_DURATION_CUMULATED_partial,
@@ -48,10 +50,53 @@ _LOCKS = {
     "pipelines_full": _LOCK_PIPELINES_full,
     "jobs_partial": _LOCK_JOBS_partial,
     "jobs_full": _LOCK_JOBS_full,
+    "fanout_partial": _LOCK_FANOUT_partial,
+    "fanout_full": _LOCK_FANOUT_full,
 }
 
 _VALID_SYNCHRONIZATION_TYPE = {"partial", "full"}
 
+# the synchronizers run by the fanout, whose locks it takes as well
+_FANOUT_SYNCHRONIZERS = (
+    "duration_cumulated",
+    "components_coverage",
+    "junit",
+    "pipelines",
+    "jobs",
+)
+
+
+class _Locks(object):
+    """Several locks acquired all or none and released together."""
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    def acquire(self, blocking=True):
+        acquired = []
+        for lock in self.locks:
+            if not lock.acquire(blocking=blocking):
+                for _lock in reversed(acquired):
+                    _lock.release()
+                return False
+            acquired.append(lock)
+        return True
+
+    def release(self):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+def _get_lock(name, synchronization_type):
+    lock = _LOCKS["%s_%s" % (name, synchronization_type)]
+    if name != "fanout":
+        return lock
+    # a fanout must not run along the synchronizers it runs
+    return _Locks(
+        [lock]
+        + [_LOCKS["%s_%s" % (n, synchronization_type)] for n in _FANOUT_SYNCHRONIZERS]
+    )
+
 
 def lock_and_run(lock, func):
     if lock.acquire(blocking=False):
@@ -95,8 +140,9 @@ def _run_synchronization(name, synchronization_type):
         )
         synchronization_function = getattr(synchronizer, synchronization_type)
         logger.info(f"{name}: running {synchronization_type} synchronization")
-        _lock_name = "%s_%s" % (name, synchronization_type)
-        return lock_and_run(_LOCKS[_lock_name], synchronization_function)
+        return lock_and_run(
+            _get_lock(name, synchronization_type), synchronization_function
+        )
 
 
 def _get_request_json_key(key, default=None):
@@ -138,3 +184,9 @@ def telco_sync():
 def jobs_sync():
     synchronization_type = _get_request_json_key("type", "partial")
     return _run_synchronization("jobs", synchronization_type)
+
+
+@api.route("/synchronization/fanout", strict_slashes=False, methods=["POST"])
+def fanout_sync():
+    synchronization_type = _get_request_json_key("type", "partial")
+    return _run_synchronization("fanout", synchronization_type)
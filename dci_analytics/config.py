@@ -21,19 +21,90 @@ import os
 logger = logging.getLogger(__name__)
 
 
+def _getenv_bool(key, default):
+    return os.getenv(key, default).lower() in ("1", "true", "yes")
+
+
 def get_config():
     _config = {
         "ELASTICSEARCH_URL": os.getenv("ELASTICSEARCH_URL", "http://127.0.0.1:9200"),
+        "ELASTICSEARCH_POOL_CONNECTIONS": int(
+            os.getenv("ELASTICSEARCH_POOL_CONNECTIONS", "10")
+        ),
+        "ELASTICSEARCH_POOL_MAXSIZE": int(
+            os.getenv("ELASTICSEARCH_POOL_MAXSIZE", "50")
+        ),
+        "ELASTICSEARCH_POOL_BLOCK": _getenv_bool("ELASTICSEARCH_POOL_BLOCK", "true"),
+        "ELASTICSEARCH_MAX_RETRIES": int(os.getenv("ELASTICSEARCH_MAX_RETRIES", "3")),
+        "ELASTICSEARCH_CONNECT_TIMEOUT": float(
+            os.getenv("ELASTICSEARCH_CONNECT_TIMEOUT", "5")
+        ),
+        "ELASTICSEARCH_READ_TIMEOUT": float(
+            os.getenv("ELASTICSEARCH_READ_TIMEOUT", "120")
+        ),
+        "ELASTICSEARCH_BULK_MAX_DOCS": int(
+            os.getenv("ELASTICSEARCH_BULK_MAX_DOCS", "500")
+        ),
+        "ELASTICSEARCH_BULK_MAX_BYTES": int(
+            os.getenv("ELASTICSEARCH_BULK_MAX_BYTES", str(10 * 1024 * 1024))
+        ),
+        "ELASTICSEARCH_BULK_FLUSH_INTERVAL": float(
+            os.getenv("ELASTICSEARCH_BULK_FLUSH_INTERVAL", "5")
+        ),
+        "ELASTICSEARCH_ALIAS_CACHE_TTL": float(
+            os.getenv("ELASTICSEARCH_ALIAS_CACHE_TTL", "30")
+        ),
+        "ELASTICSEARCH_META_CACHE_TTL": float(
+            os.getenv("ELASTICSEARCH_META_CACHE_TTL", "30")
+        ),
+        "ELASTICSEARCH_SEARCH_PAGE_SIZE": int(
+            os.getenv("ELASTICSEARCH_SEARCH_PAGE_SIZE", "1000")
+        ),
+        "ELASTICSEARCH_NUMBER_OF_REPLICAS": int(
+            os.getenv("ELASTICSEARCH_NUMBER_OF_REPLICAS", "1")
+        ),
+        "JOBS_INDEX_RETENTION": int(os.getenv("JOBS_INDEX_RETENTION", "2")),
+        "SYNC_WATERMARK_OVERLAP": int(os.getenv("SYNC_WATERMARK_OVERLAP", "300")),
+        "SYNC_PREFETCH_PAGES": int(os.getenv("SYNC_PREFETCH_PAGES", "2")),
         "POSTGRESQL_USER": os.getenv("POSTGRESQL_USER", "dci"),
         "POSTGRESQL_PASSWORD": os.getenv("POSTGRESQL_PASSWORD", "dci"),
         "POSTGRESQL_HOST": os.getenv("POSTGRESQL_HOST", "127.0.0.1"),
         "POSTGRESQL_PORT": os.getenv("POSTGRESQL_PORT", "5432"),
         "POSTGRESQL_DATABASE": os.getenv("POSTGRESQL_DATABASE", "dci"),
+        "POSTGRESQL_POOL_SIZE": int(os.getenv("POSTGRESQL_POOL_SIZE", "5")),
+        "POSTGRESQL_MAX_OVERFLOW": int(os.getenv("POSTGRESQL_MAX_OVERFLOW", "25")),
+        "POSTGRESQL_POOL_RECYCLE": int(os.getenv("POSTGRESQL_POOL_RECYCLE", "3600")),
         "DCI_LOGIN": os.getenv("DCI_LOGIN", ""),
         "DCI_PASSWORD": os.getenv("DCI_PASSWORD", ""),
         "DCI_CLIENT_ID": os.getenv("DCI_CLIENT_ID", ""),
         "DCI_API_SECRET": os.getenv("DCI_API_SECRET", ""),
         "DCI_CS_URL": os.getenv("DCI_CS_URL", "http://api:5000"),
+        "DCI_FILE_MAX_SIZE": int(
+            os.getenv("DCI_FILE_MAX_SIZE", str(512 * 1024 * 1024))
+        ),
+        "JUNIT_XML_PARSER": os.getenv("JUNIT_XML_PARSER", "etree"),
+        "JOBS_CACHE_JUNIT_LOCAL_DIR": os.getenv("JOBS_CACHE_JUNIT_LOCAL_DIR", ""),
+        "JOBS_CACHE_JUNIT_LOCAL_MAX_SIZE": int(
+            os.getenv("JOBS_CACHE_JUNIT_LOCAL_MAX_SIZE", str(1024 * 1024 * 1024))
+        ),
+        "JOBS_CACHE_JUNIT_MEMORY_MAX_SIZE": int(
+            os.getenv("JOBS_CACHE_JUNIT_MEMORY_MAX_SIZE", str(64 * 1024 * 1024))
+        ),
+        "JUNIT_PARSER_PROCESSES": int(os.getenv("JUNIT_PARSER_PROCESSES", "0")),
+        "DCI_API_MAX_CONCURRENCY": int(os.getenv("DCI_API_MAX_CONCURRENCY", "16")),
+        "JOBS_SYNC_WORKERS": int(os.getenv("JOBS_SYNC_WORKERS", "16")),
+        "JOBS_SYNC_MAX_IN_FLIGHT": int(os.getenv("JOBS_SYNC_MAX_IN_FLIGHT", "64")),
+        "JOBS_SYNC_MAX_ES_WRITES": int(os.getenv("JOBS_SYNC_MAX_ES_WRITES", "8")),
+        "JOBS_SYNC_MAX_FILES_DOWNLOADS": int(
+            os.getenv("JOBS_SYNC_MAX_FILES_DOWNLOADS", "8")
+        ),
+        # number of unacked messages delivered to the worker
+        "WORKER_PREFETCH_COUNT": int(os.getenv("WORKER_PREFETCH_COUNT", "100")),
+        # number of threads processing the jobs of a batch
+        "WORKER_THREADS": int(os.getenv("WORKER_THREADS", "8")),
+        "WORKER_BATCH_SIZE": int(os.getenv("WORKER_BATCH_SIZE", "50")),
+        "WORKER_BATCH_INTERVAL": float(os.getenv("WORKER_BATCH_INTERVAL", "2")),
+        "WORKER_MAX_REQUEUES": int(os.getenv("WORKER_MAX_REQUEUES", "5")),
     }
 
     return _config
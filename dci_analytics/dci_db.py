@@ -15,15 +15,22 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import threading
+
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
 
 from dci_analytics import config
 
 
-def get_session_db():
+_ENGINE = None
+_SESSION_FACTORY = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def _get_uri():
     _CONFIG = config.CONFIG
-    uri = "postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}".format(
+    return "postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}".format(
         db_user=_CONFIG.get("POSTGRESQL_USER"),
         db_password=_CONFIG.get("POSTGRESQL_PASSWORD"),
         db_host=_CONFIG.get("POSTGRESQL_HOST"),
@@ -31,13 +38,42 @@ def get_session_db():
         db_name=_CONFIG.get("POSTGRESQL_DATABASE"),
     )
 
-    return sessionmaker(
-        bind=sqlalchemy.create_engine(
-            uri,
-            pool_size=5,
-            max_overflow=25,
-            encoding="utf8",
-            convert_unicode=True,
-            echo=False,
-        )
-    )()
+
+def get_engine():
+    """Return the engine, and its connection pool, shared by the whole process."""
+    global _ENGINE
+    global _SESSION_FACTORY
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _CONFIG = config.CONFIG
+                engine = sqlalchemy.create_engine(
+                    _get_uri(),
+                    pool_size=_CONFIG["POSTGRESQL_POOL_SIZE"],
+                    max_overflow=_CONFIG["POSTGRESQL_MAX_OVERFLOW"],
+                    pool_recycle=_CONFIG["POSTGRESQL_POOL_RECYCLE"],
+                    pool_pre_ping=True,
+                    encoding="utf8",
+                    convert_unicode=True,
+                    echo=False,
+                )
+                _SESSION_FACTORY = sessionmaker(bind=engine)
+                _ENGINE = engine
+    return _ENGINE
+
+
+def get_session_db():
+    get_engine()
+    return _SESSION_FACTORY()
+
+
+def get_pool_stats():
+    if _ENGINE is None:
+        return {}
+    pool = _ENGINE.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
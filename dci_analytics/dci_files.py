@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import contextlib
+
+from dci_analytics import config
+
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+class _LimitedReader(object):
+    """Read a raw response body, failing once max_size bytes are exceeded."""
+
+    def __init__(self, raw, max_size=None):
+        self.raw = raw
+        self.max_size = max_size
+        self.size = 0
+
+    def _check_size(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise FileTooLarge("file larger than %s bytes" % self.max_size)
+        return data
+
+    def read(self, size=-1):
+        if size is not None and size >= 0:
+            return self._check_size(self.raw.read(size))
+        chunks = []
+        while True:
+            chunk = self._check_size(self.raw.read(_CHUNK_SIZE))
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+@contextlib.contextmanager
+def open_file(api_conn, file_id, max_size=None):
+    """Open the content of a DCI file as a binary stream.
+
+    The content is read from the response as it is consumed instead of
+    being loaded in memory, FileTooLarge is raised once more than
+    max_size bytes are read.
+    """
+    if max_size is None:
+        max_size = config.CONFIG["DCI_FILE_MAX_SIZE"] or None
+    api_url = config.CONFIG["DCI_CS_URL"]
+    r = api_conn.session.get(f"{api_url}/api/v2/files/{file_id}/content", stream=True)
+    try:
+        r.raise_for_status()
+        content_length = r.headers.get("Content-Length")
+        if max_size is not None and content_length and int(content_length) > max_size:
+            raise FileTooLarge(
+                "file %s is %s bytes, larger than %s bytes"
+                % (file_id, content_length, max_size)
+            )
+        r.raw.decode_content = True
+        yield _LimitedReader(r.raw, max_size)
+    finally:
+        r.close()
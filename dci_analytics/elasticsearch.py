@@ -16,9 +16,14 @@
 # under the License.
 
 from datetime import datetime as dt
+import json as jsonlib
 import logging
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from dci_analytics import config
 
@@ -26,11 +31,102 @@ _ES_URL = config.CONFIG.get("ELASTICSEARCH_URL")
 
 logger = logging.getLogger(__name__)
 
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+_ADAPTER = None
+_REQUESTS_COUNTER = {"requests": 0, "errors": 0}
+_REQUESTS_COUNTER_LOCK = threading.Lock()
+_ALIASES_CACHE = {}
+_ALIASES_CACHE_LOCK = threading.Lock()
+_INDEX_META_CACHE = {}
+_INDEX_META_CACHE_LOCK = threading.Lock()
+# index or alias -> mapping version, the indices known to exist with
+# their mapping up to date are only checked once per process
+_INDEX_REGISTRY = {}
+_INDEX_REGISTRY_LOCK = threading.Lock()
+
+
+def _build_session():
+    global _ADAPTER
+    _config = config.CONFIG
+    retries = Retry(
+        total=_config["ELASTICSEARCH_MAX_RETRIES"],
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,
+    )
+    _ADAPTER = HTTPAdapter(
+        pool_connections=_config["ELASTICSEARCH_POOL_CONNECTIONS"],
+        pool_maxsize=_config["ELASTICSEARCH_POOL_MAXSIZE"],
+        pool_block=_config["ELASTICSEARCH_POOL_BLOCK"],
+        max_retries=retries,
+    )
+    session = requests.Session()
+    session.mount("http://", _ADAPTER)
+    session.mount("https://", _ADAPTER)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_session():
+    """Return the process wide keep-alive session used to talk to Elasticsearch."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = _build_session()
+    return _SESSION
+
+
+def _request(method, url, **kwargs):
+    _config = config.CONFIG
+    kwargs.setdefault(
+        "timeout",
+        (
+            _config["ELASTICSEARCH_CONNECT_TIMEOUT"],
+            _config["ELASTICSEARCH_READ_TIMEOUT"],
+        ),
+    )
+    with _REQUESTS_COUNTER_LOCK:
+        _REQUESTS_COUNTER["requests"] += 1
+    try:
+        return get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        with _REQUESTS_COUNTER_LOCK:
+            _REQUESTS_COUNTER["errors"] += 1
+        raise
+
+
+def get_pool_stats():
+    stats = {
+        "pool_connections": config.CONFIG["ELASTICSEARCH_POOL_CONNECTIONS"],
+        "pool_maxsize": config.CONFIG["ELASTICSEARCH_POOL_MAXSIZE"],
+        "pools": [],
+    }
+    with _REQUESTS_COUNTER_LOCK:
+        stats.update(_REQUESTS_COUNTER)
+    if _ADAPTER is None:
+        return stats
+    pools = _ADAPTER.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        stats["pools"].append(
+            {
+                "host": "%s://%s:%s" % (pool.scheme, pool.host, pool.port),
+                "connections_created": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": pool.pool.qsize() if pool.pool else 0,
+            }
+        )
+    return stats
+
 
 def push(index, data, doc_id):
     url = "%s/%s/_create/%s" % (_ES_URL, index, doc_id)
     logger.debug(f"url: {url}")
-    res = requests.post(url, json=data)
+    res = _request("post", url, json=data)
     if res.status_code != 201:
         logger.debug(
             "error while pushing data to elastic index %s: %s" % (index, res.text)
@@ -40,7 +136,7 @@ def push(index, data, doc_id):
 def get(index, doc_id):
     url = "%s/%s/_doc/%s" % (_ES_URL, index, doc_id)
     logger.debug(f"url: {url}")
-    res = requests.get(url)
+    res = _request("get", url)
     if res.status_code == 404:
         return None
     elif res.status_code == 200:
@@ -53,20 +149,120 @@ def get(index, doc_id):
         return None
 
 
+def mget(index, doc_ids, source=True, source_includes=None):
+    """Get several documents at once, return their _source by id.
+
+    With source set to False only the existence of the documents is
+    checked and their _source is not transferred.
+    """
+    if not doc_ids:
+        return {}
+    url = "%s/%s/_mget" % (_ES_URL, index)
+    logger.debug(f"url: {url}")
+    params = {}
+    if not source:
+        params["_source"] = "false"
+    elif source_includes is not None:
+        params["_source_includes"] = ",".join(source_includes)
+    res = _request("post", url, json={"ids": list(doc_ids)}, params=params)
+    if res.status_code != 200:
+        if res.status_code != 404:
+            logger.error(
+                "error while getting documents from index %s: %s" % (index, res.text)
+            )
+        return {}
+    return {
+        doc["_id"]: doc.get("_source", {})
+        for doc in res.json()["docs"]
+        if doc.get("found")
+    }
+
+
 def search(index, query=None):
-    res = requests.get("%s/%s/_search?q=%s" % (_ES_URL, index, query))
+    res = _request("get", "%s/%s/_search" % (_ES_URL, index), params={"q": query})
     return res.json()
 
 
-def search_json(index, json):
-    res = requests.get("%s/%s/_search" % (_ES_URL, index), json=json)
+def _with_source_filter(json, source_includes=None, source_excludes=None):
+    if source_includes is None and source_excludes is None:
+        return json
+    json = dict(json)
+    json["_source"] = {}
+    if source_includes is not None:
+        json["_source"]["includes"] = source_includes
+    if source_excludes is not None:
+        json["_source"]["excludes"] = source_excludes
+    return json
+
+
+def search_json(index, json, source_includes=None, source_excludes=None):
+    json = _with_source_filter(json, source_includes, source_excludes)
+    res = _request("get", "%s/%s/_search" % (_ES_URL, index), json=json)
     return res.json()
 
 
+def open_point_in_time(index, keep_alive="1m"):
+    url = "%s/%s/_pit" % (_ES_URL, index)
+    res = _request("post", url, params={"keep_alive": keep_alive})
+    if res.status_code != 200:
+        logger.error(
+            "error while opening a point in time on index %s: %s" % (index, res.text)
+        )
+        return None
+    return res.json()["id"]
+
+
+def close_point_in_time(pit_id):
+    res = _request("delete", "%s/_pit" % _ES_URL, json={"id": pit_id})
+    if res.status_code != 200:
+        logger.debug("error while closing point in time: %s" % res.text)
+
+
+def search_iter(
+    index,
+    json,
+    page_size=None,
+    keep_alive="1m",
+    source_includes=None,
+    source_excludes=None,
+):
+    """Yield every hit matching the query, whatever the number of results.
+
+    The pages are read from a point in time with search_after so that each
+    page costs the same and the max_result_window limit does not apply.
+    """
+    page_size = page_size or config.CONFIG["ELASTICSEARCH_SEARCH_PAGE_SIZE"]
+    body = dict(_with_source_filter(json, source_includes, source_excludes))
+    body.pop("from", None)
+    body["size"] = page_size
+    body.setdefault("sort", ["_shard_doc"])
+
+    pit_id = open_point_in_time(index, keep_alive)
+    if pit_id is None:
+        return
+    try:
+        while True:
+            body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+            res = _request("post", "%s/_search" % _ES_URL, json=body)
+            if res.status_code != 200:
+                logger.error("error while searching index %s: %s" % (index, res.text))
+                break
+            res = res.json()
+            pit_id = res.get("pit_id", pit_id)
+            hits = res.get("hits", {}).get("hits", [])
+            for hit in hits:
+                yield hit
+            if len(hits) < page_size:
+                break
+            body["search_after"] = hits[-1]["sort"]
+    finally:
+        close_point_in_time(pit_id)
+
+
 def update(index, data, doc_id):
     url = "%s/%s/_update/%s" % (_ES_URL, index, doc_id)
     logger.debug(f"url: {url}")
-    res = requests.post(url, json={"doc": data})
+    res = _request("post", url, json={"doc": data})
     if res.status_code != 201 and res.status_code != 200:
         logger.error(
             "error while updating document %s to index %s: %s"
@@ -74,6 +270,212 @@ def update(index, data, doc_id):
         )
 
 
+def is_transient_error(error):
+    """Return whether a failed bulk write may succeed if retried."""
+    status = error["status"]
+    return status is None or status == 429 or status >= 500
+
+
+class BulkWriter(object):
+    """Buffer create/index/update actions and send them with the _bulk API.
+
+    The buffer is flushed when it holds max_docs actions, when it reaches
+    max_bytes of NDJSON or when flush_interval seconds elapsed since the last
+    flush. Per item failures are logged and kept in the errors attribute.
+
+    The _bulk requests are sent out of the lock, so the other threads keep
+    buffering actions meanwhile, and send_semaphore, if any, bounds the
+    number of requests in flight. flush() returns once all the buffered
+    actions have been sent. The on_sent callback of an action is called once
+    the request holding it has been sent.
+    """
+
+    def __init__(
+        self, max_docs=None, max_bytes=None, flush_interval=None, send_semaphore=None
+    ):
+        _config = config.CONFIG
+        self.max_docs = max_docs or _config["ELASTICSEARCH_BULK_MAX_DOCS"]
+        self.max_bytes = max_bytes or _config["ELASTICSEARCH_BULK_MAX_BYTES"]
+        if flush_interval is None:
+            flush_interval = _config["ELASTICSEARCH_BULK_FLUSH_INTERVAL"]
+        self.flush_interval = flush_interval
+        self.errors = []
+        self.stats = {"flushes": 0, "actions": 0, "errors": 0}
+        self.send_semaphore = send_semaphore
+        self._lock = threading.RLock()
+        self._sent = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._lines = []
+        self._callbacks = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def create(self, index, data, doc_id):
+        self._add("create", index, doc_id, data)
+
+    def index(self, index, data, doc_id, on_sent=None):
+        self._add("index", index, doc_id, data, on_sent)
+
+    def update(self, index, data, doc_id):
+        self._add("update", index, doc_id, {"doc": data})
+
+    def upsert(self, index, data, doc_id):
+        self._add("update", index, doc_id, {"doc": data, "doc_as_upsert": True})
+
+    def script_upsert(self, index, doc_id, script, params, upsert):
+        source = {
+            "script": {"source": script, "lang": "painless", "params": params},
+            "upsert": upsert,
+        }
+        self._add("update", index, doc_id, source)
+
+    def _add(self, op_type, index, doc_id, source, on_sent=None):
+        action = jsonlib.dumps({op_type: {"_index": index, "_id": doc_id}})
+        lines = "%s\n%s\n" % (action, jsonlib.dumps(source))
+        with self._lock:
+            self._lines.append(lines)
+            if on_sent is not None:
+                self._callbacks.append(on_sent)
+            self._size += len(lines)
+            if (
+                len(self._lines) < self.max_docs
+                and self._size < self.max_bytes
+                and time.monotonic() - self._last_flush < self.flush_interval
+            ):
+                return
+            batch = self._take()
+        self._send(*batch)
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        errors = self._send(*batch)
+        with self._lock:
+            while self._in_flight:
+                self._sent.wait()
+        return errors
+
+    def _take(self):
+        """Swap the buffer out, to be sent by the caller out of the lock."""
+        self._last_flush = time.monotonic()
+        body = "".join(self._lines).encode("utf-8")
+        nb_actions = len(self._lines)
+        callbacks = self._callbacks
+        self._lines = []
+        self._callbacks = []
+        self._size = 0
+        if nb_actions:
+            self._in_flight += 1
+        return body, nb_actions, callbacks
+
+    def _send(self, body, nb_actions, callbacks):
+        if not nb_actions:
+            return []
+        try:
+            if self.send_semaphore is None:
+                errors = self._post(body, nb_actions)
+            else:
+                with self.send_semaphore:
+                    errors = self._post(body, nb_actions)
+            for on_sent in callbacks:
+                on_sent()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._sent.notify_all()
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["actions"] += nb_actions
+            self.errors.extend(errors)
+            self.stats["errors"] += len(errors)
+        return errors
+
+    def _post(self, body, nb_actions):
+        errors = []
+        try:
+            res = _request(
+                "post",
+                "%s/_bulk" % _ES_URL,
+                data=body,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error("error while sending bulk request: %s" % str(e))
+            errors.append({"status": None, "error": str(e), "actions": nb_actions})
+            return errors
+        if res.status_code != 200:
+            logger.error("error while sending bulk request: %s" % res.text)
+            errors.append(
+                {"status": res.status_code, "error": res.text, "actions": nb_actions}
+            )
+            return errors
+
+        res = res.json()
+        if not res.get("errors"):
+            return errors
+        for item in res["items"]:
+            op_type, result = list(item.items())[0]
+            if "error" not in result:
+                continue
+            if op_type == "create" and result["status"] == 409:
+                logger.debug(
+                    "document %s already exists in index %s"
+                    % (result["_id"], result["_index"])
+                )
+                continue
+            logger.error(
+                "error while writing document %s to index %s: %s"
+                % (result["_id"], result["_index"], result["error"])
+            )
+            errors.append(
+                {
+                    "op_type": op_type,
+                    "index": result["_index"],
+                    "id": result["_id"],
+                    "status": result["status"],
+                    "error": result["error"],
+                }
+            )
+        return errors
+
+
+def upsert(index, data, doc_id):
+    url = "%s/%s/_update/%s" % (_ES_URL, index, doc_id)
+    logger.debug(f"url: {url}")
+    res = _request("post", url, json={"doc": data, "doc_as_upsert": True})
+    if res.status_code != 201 and res.status_code != 200:
+        logger.error(
+            "error while upserting document %s to index %s: %s"
+            % (doc_id, index, res.text)
+        )
+
+
+def script_upsert(index, doc_id, script, params, upsert):
+    url = "%s/%s/_update/%s" % (_ES_URL, index, doc_id)
+    logger.debug(f"url: {url}")
+    res = _request(
+        "post",
+        url,
+        json={
+            "script": {"source": script, "lang": "painless", "params": params},
+            "upsert": upsert,
+        },
+    )
+    if res.status_code != 201 and res.status_code != 200:
+        logger.error(
+            "error while updating document %s of index %s: %s"
+            % (doc_id, index, res.text)
+        )
+        return False
+    return True
+
+
 def get_autocompletion_values(index, team_id, field, is_admin=False, size=10):
     if "." in field:
         path = field.split(".")[0]
@@ -104,34 +506,186 @@ def get_autocompletion_values(index, team_id, field, is_admin=False, size=10):
         return [f["key"] for f in res["aggregations"]["autocomplete"]["buckets"]]
 
 
-def init_index(index, json=None):
+def _is_index_registered(index, version):
+    with _INDEX_REGISTRY_LOCK:
+        return index in _INDEX_REGISTRY and _INDEX_REGISTRY[index] == version
+
+
+def _register_index(index, version):
+    with _INDEX_REGISTRY_LOCK:
+        _INDEX_REGISTRY[index] = version
+
+
+def invalidate_index_registry(index=None):
+    with _INDEX_REGISTRY_LOCK:
+        if index is None:
+            _INDEX_REGISTRY.clear()
+        else:
+            _INDEX_REGISTRY.pop(index, None)
+
+
+def _with_mapping_version(mapping, version):
+    if version is None:
+        return mapping
+    mapping = dict(mapping or {})
+    mapping["_meta"] = dict(mapping.get("_meta", {}), mapping_version=version)
+    return mapping
+
+
+def _upgrade_mapping(index, mapping, version):
+    """Apply the mapping to an existing index if its version is older."""
+    if version is None:
+        return True
+    meta = get_index_meta(index, use_cache=False)
+    if meta is None:
+        # the whole _meta is replaced, it must be known to be kept
+        return False
+    if meta.get("mapping_version", 0) >= version:
+        return True
+    mapping = dict(mapping or {})
+    mapping["_meta"] = dict(meta, mapping_version=version)
+    res = _request("put", "%s/%s/_mapping" % (_ES_URL, index), json=mapping)
+    if res.status_code != 200:
+        logger.error("error while upgrading index %s mapping: %s" % (index, res.text))
+        return False
+    logger.info("index %s mapping upgraded to version %s" % (index, version))
+    _cache_index_meta(index, mapping["_meta"])
+    return True
+
+
+def init_index(index, json=None, version=None):
+    if _is_index_registered(index, version):
+        return
     url = "%s/%s" % (_ES_URL, index)
-    result = requests.get(url)
+    result = _request("get", url)
+    json = _with_mapping_version(json, version)
     if result.status_code == 404:
-        requests.put("%s/%s" % (_ES_URL, index))
+        _request("put", "%s/%s" % (_ES_URL, index))
         url = "%s/%s/_mapping" % (_ES_URL, index)
         if json:
-            requests.put(url, json=json)
+            _request("put", url, json=json)
         else:
-            requests.put(url)
+            _request("put", url)
+    elif result.status_code == 200:
+        if not _upgrade_mapping(index, json, version):
+            return
+    else:
+        return
+    _register_index(index, version)
 
 
-def update_index(index, json):
+def update_index(index, json, version=None):
+    if _is_index_registered(index, version):
+        return False
     is_index_created = False
     index_url = "%s/%s" % (_ES_URL, index)
-    result = requests.get(index_url)
+    result = _request("get", index_url)
     if result.status_code != 200:
-        r = requests.put(index_url, json=json).json()
+        json = dict(json)
+        json["mappings"] = _with_mapping_version(json.get("mappings"), version)
+        r = _request("put", index_url, json=json).json()
         if "acknowledged" not in r:
             logger.error(str(r))
+            return True
         is_index_created = True
+    elif not _upgrade_mapping(index, json.get("mappings"), version):
+        return False
+    _register_index(index, version)
     return is_index_created
 
 
+def update_index_settings(index, settings):
+    url = "%s/%s/_settings" % (_ES_URL, index)
+    logger.debug(f"url: {url}")
+    res = _request("put", url, json=settings)
+    if res.status_code != 200:
+        logger.error("error while updating index %s settings: %s" % (index, res.text))
+
+
+def refresh_index(index):
+    res = _request("post", "%s/%s/_refresh" % (_ES_URL, index))
+    if res.status_code != 200:
+        logger.error("error while refreshing index %s: %s" % (index, res.text))
+
+
+def forcemerge_index(index, max_num_segments=None):
+    params = {}
+    if max_num_segments:
+        params["max_num_segments"] = max_num_segments
+    # a merge can take a long time, do not apply the read timeout
+    res = _request(
+        "post",
+        "%s/%s/_forcemerge" % (_ES_URL, index),
+        params=params,
+        timeout=(config.CONFIG["ELASTICSEARCH_CONNECT_TIMEOUT"], None),
+    )
+    if res.status_code != 200:
+        logger.error("error while merging index %s: %s" % (index, res.text))
+
+
+def _get_index_timestamp(index_prefix, index_name):
+    timestamp = index_name[len(index_prefix) + 1 :]  # noqa: E203
+    try:
+        return float(timestamp)
+    except ValueError:
+        return None
+
+
+def _get_aliased_indices(index_prefix):
+    url = "%s/_cat/aliases/%s-*" % (_ES_URL, index_prefix)
+    res = _request("get", url, params={"format": "json", "h": "index"})
+    if res.status_code != 200:
+        logger.error("error while getting aliases: %s" % res.text)
+        return None
+    return {a["index"] for a in res.json()}
+
+
+def delete_old_indices(index_prefix, keep):
+    """Delete the <index_prefix>-<timestamp> indices but the keep newest ones.
+
+    Only the aliased indices are kept, the unaliased ones left by a failed
+    synchronization are deleted once a newer index is aliased, the newer
+    ones may still be loading.
+    """
+    aliased_indices = _get_aliased_indices(index_prefix)
+    if aliased_indices is None:
+        return []
+    url = "%s/_cat/indices/%s-*" % (_ES_URL, index_prefix)
+    res = _request("get", url, params={"format": "json", "h": "index"})
+    if res.status_code != 200:
+        logger.error("error while listing %s indices: %s" % (index_prefix, res.text))
+        return []
+    indices = []
+    for i in res.json():
+        timestamp = _get_index_timestamp(index_prefix, i["index"])
+        if timestamp is not None:
+            indices.append((timestamp, i["index"]))
+    indices.sort()
+    aliased = [i for i in indices if i[1] in aliased_indices]
+    old_indices = aliased[: max(len(aliased) - keep, 0)]
+    if aliased:
+        old_indices += [
+            i for i in indices if i[1] not in aliased_indices and i < aliased[-1]
+        ]
+    deleted_indices = []
+    for _, index_name in sorted(old_indices):
+        logger.info("delete old index %s" % index_name)
+        res = _request("delete", "%s/%s" % (_ES_URL, index_name))
+        if res.status_code != 200:
+            logger.error("error while deleting index %s: %s" % (index_name, res.text))
+        else:
+            deleted_indices.append(index_name)
+            invalidate_index_registry(index_name)
+    return deleted_indices
+
+
 def update_index_meta(index, first_job_date=None, last_job_date=None):
     url = "%s/%s/_mapping" % (_ES_URL, index)
     logger.debug(f"url: {url}")
-    meta = get_index_meta(index)
+    meta = get_index_meta(index, use_cache=False)
+    if meta is None:
+        logger.error("index %s meta not updated, it could not be read" % index)
+        return
     meta = {"_meta": meta}
     if first_job_date:
         meta["_meta"]["first_sync_date"] = first_job_date
@@ -139,41 +693,92 @@ def update_index_meta(index, first_job_date=None, last_job_date=None):
         meta["_meta"]["last_sync_date"] = last_job_date
 
     if first_job_date or last_job_date:
-        res = requests.put(url, json=meta)
+        res = _request("put", url, json=meta)
         if res.status_code != 200:
             logger.debug("error while updating index %s meta: %s" % (index, res.text))
+        else:
+            _cache_index_meta(index, meta["_meta"])
+
+
+def _cache_index_meta(index, meta):
+    with _INDEX_META_CACHE_LOCK:
+        _INDEX_META_CACHE[index] = (
+            meta,
+            time.monotonic() + config.CONFIG["ELASTICSEARCH_META_CACHE_TTL"],
+        )
+
 
+def invalidate_index_meta_cache(index=None):
+    with _INDEX_META_CACHE_LOCK:
+        if index is None:
+            _INDEX_META_CACHE.clear()
+        else:
+            _INDEX_META_CACHE.pop(index, None)
+
+
+def get_index_meta(index, use_cache=True):
+    """Return the _meta of the index mapping, None if it could not be read."""
+    if use_cache:
+        with _INDEX_META_CACHE_LOCK:
+            cached = _INDEX_META_CACHE.get(index)
+        if cached and cached[1] > time.monotonic():
+            return dict(cached[0])
 
-def get_index_meta(index):
     url = "%s/%s/_mapping" % (_ES_URL, index)
     logger.debug(f"url: {url}")
 
-    res = requests.get(url)
+    # only transfer the _meta section, not the whole mapping of the index
+    res = _request("get", url, params={"filter_path": "*.mappings._meta"})
     if res.status_code != 200:
         logger.error("error while getting index mapping of %s: %s" % (index, res.text))
+        return None
     res = res.json()
-    index_key = list(res.keys())[0]
-    if "_meta" in res[index_key]["mappings"]:
-        return res[index_key]["mappings"]["_meta"]
-    return {}
+    meta = {}
+    if res:
+        index_key = list(res.keys())[0]
+        meta = res[index_key]["mappings"].get("_meta", {})
+    _cache_index_meta(index, meta)
+    return dict(meta)
 
 
-def get_latest_index_alias(index_prefix):
-    aliases_url = "%s/_cat/aliases?format=json" % _ES_URL
-    result = requests.get(aliases_url)
+def _get_latest_index_alias(index_prefix):
+    aliases_url = "%s/_cat/aliases/%s-*" % (_ES_URL, index_prefix)
+    result = _request("get", aliases_url, params={"format": "json", "h": "alias"})
     if result.status_code != 200:
         logger.error("error while getting aliases: %s" % result.text)
         return None
-    result = result.json()
-    if len(result) == 0:
-        logger.debug("no aliases found")
+    aliases = [a["alias"] for a in result.json()]
+    if len(aliases) == 0:
+        logger.debug("no aliases found for prefix %s" % index_prefix)
         return None
-
-    aliases = [a["alias"] for a in result if a["alias"].startswith(index_prefix)]
     aliases.sort()
     return aliases[-1]
 
 
+def get_latest_index_alias(index_prefix):
+    now = time.monotonic()
+    with _ALIASES_CACHE_LOCK:
+        cached = _ALIASES_CACHE.get(index_prefix)
+    if cached and cached[1] > now:
+        return cached[0]
+    alias = _get_latest_index_alias(index_prefix)
+    if alias:
+        with _ALIASES_CACHE_LOCK:
+            _ALIASES_CACHE[index_prefix] = (
+                alias,
+                now + config.CONFIG["ELASTICSEARCH_ALIAS_CACHE_TTL"],
+            )
+    return alias
+
+
+def invalidate_alias_cache(index_prefix=None):
+    with _ALIASES_CACHE_LOCK:
+        if index_prefix is None:
+            _ALIASES_CACHE.clear()
+        else:
+            _ALIASES_CACHE.pop(index_prefix, None)
+
+
 def generate_new_index_name(index_prefix):
     now_timestamp = dt.now().timestamp()
     return f"{index_prefix}-{now_timestamp}"
@@ -188,5 +793,6 @@ def generate_new_alias_name(alias_prefix):
 def add_alias_to_index(alias_prefix, index_name):
     alias_name = generate_new_alias_name(alias_prefix)
     alias_actions = {"actions": [{"add": {"index": index_name, "alias": alias_name}}]}
-    requests.post(f"{_ES_URL}/_aliases", json=alias_actions)
+    _request("post", f"{_ES_URL}/_aliases", json=alias_actions)
+    invalidate_alias_cache(alias_prefix)
     return alias_name
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy import sql
+
+from dci.db import models2
+
+
+def _with_relationships(query):
+    """Eager load the job relationships serialized by the data layer."""
+    return (
+        query.options(sqlalchemy.orm.selectinload("components"))
+        .options(sqlalchemy.orm.selectinload("jobstates"))
+        .options(sqlalchemy.orm.selectinload("jobstates.files"))
+        .options(sqlalchemy.orm.selectinload("files"))
+        .options(sqlalchemy.orm.selectinload("results"))
+        .options(sqlalchemy.orm.selectinload("keys_values"))
+        .options(sqlalchemy.orm.joinedload("pipeline", innerjoin=False))
+        .options(sqlalchemy.orm.joinedload("product", innerjoin=False))
+        .options(sqlalchemy.orm.joinedload("team", innerjoin=True))
+        .options(sqlalchemy.orm.joinedload("topic", innerjoin=True))
+        .options(sqlalchemy.orm.joinedload("remoteci", innerjoin=True))
+    )
+
+
+def _get_jobs_query(session_db, unit, amount, status=None, updated_since=None):
+    # the data layer get_jobs() only pages with an offset and returns the
+    # serialized jobs, its filters are applied here to page with a keyset
+    query = session_db.query(models2.Job)
+    if status:
+        query = query.filter(models2.Job.status == status)
+    query = query.filter(models2.Job.state != "archived")
+    if updated_since is not None:
+        query = query.filter(models2.Job.updated_at >= updated_since)
+    else:
+        delta = timedelta(**{unit: amount})
+        query = query.filter(models2.Job.created_at >= (datetime.utcnow() - delta))
+    return query
+
+
+def get_jobs_after(
+    session_db, cursor, limit, unit, amount, status=None, updated_since=None
+):
+    """Return the limit jobs following cursor in (created_at, id) order.
+
+    cursor is None for the first page, the returned cursor must be given
+    back to get the next page. When updated_since is set, the jobs updated
+    since that date are returned instead of the ones created in the
+    unit/amount time frame.
+    """
+    query = _get_jobs_query(
+        session_db, unit, amount, status=status, updated_since=updated_since
+    )
+    if cursor is not None:
+        query = query.filter(
+            sql.tuple_(models2.Job.created_at, models2.Job.id) > sql.tuple_(*cursor)
+        )
+    query = query.order_by(models2.Job.created_at.asc(), models2.Job.id.asc())
+    query = _with_relationships(query).limit(limit)
+    rows = query.all()
+    if not rows:
+        return [], cursor
+    jobs = [j.serialize(ignore_columns=["data"]) for j in rows]
+    return jobs, (rows[-1].created_at, rows[-1].id)
+
+
+def iter_jobs(session_db, unit, amount, limit=100, status=None, updated_since=None):
+    """Yield the jobs of the time frame page by page.
+
+    The pages are read with a (created_at, id) keyset instead of an offset so
+    each page costs the same and jobs created during the scan do not shift
+    the following pages.
+    """
+    cursor = None
+    while True:
+        jobs, cursor = get_jobs_after(
+            session_db,
+            cursor,
+            limit,
+            unit,
+            amount,
+            status=status,
+            updated_since=updated_since,
+        )
+        if not jobs:
+            break
+        yield jobs
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import concurrent.futures
+import logging
+import threading
+
+from dci_analytics import config
+from dci_analytics import elasticsearch as es
+from dci_analytics import local_cache
+
+
+logger = logging.getLogger(__name__)
+
+# the parsed junit files are stored by content md5, or by file id when the
+# md5 is unknown, a same junit content attached to several jobs is
+# downloaded and parsed once whichever synchronizer needs it first
+_INDEX = "junit_files_cache"
+
+_LOCK = threading.Lock()
+# the files being parsed and the parsed ones whose cache document is still
+# buffered in a bulk writer, by key, the files shared by several jobs of a
+# page are not parsed again meanwhile. The parsed files are kept up to
+# JOBS_CACHE_JUNIT_MEMORY_MAX_SIZE bytes of junit files.
+_PARSED = collections.OrderedDict()
+_PARSED_SIZES = {}
+_STATS = {"hits": 0, "misses": 0, "waits": 0}
+# to increment when the index mapping changes
+_MAPPING_VERSION = 1
+
+_LOCAL_CACHE = None
+_LOCAL_CACHE_LOCK = threading.Lock()
+
+
+def _count(stat):
+    with _LOCK:
+        _STATS[stat] += 1
+
+
+def get_stats():
+    with _LOCK:
+        return dict(_STATS)
+
+
+def init_index():
+    es.init_index(
+        _INDEX,
+        json={
+            "properties": {
+                "md5": {"type": "keyword"},
+                "created_at": {"type": "date"},
+                "testsuites": {"enabled": False},
+                "junit_content": {"enabled": False},
+            }
+        },
+        version=_MAPPING_VERSION,
+    )
+
+
+def get_local_cache():
+    """Return the local cache in front of the index, if configured."""
+    global _LOCAL_CACHE
+    directory = config.CONFIG["JOBS_CACHE_JUNIT_LOCAL_DIR"]
+    if not directory:
+        return None
+    with _LOCAL_CACHE_LOCK:
+        if _LOCAL_CACHE is None:
+            _LOCAL_CACHE = local_cache.open_cache(
+                directory,
+                _INDEX,
+                config.CONFIG["JOBS_CACHE_JUNIT_LOCAL_MAX_SIZE"],
+            )
+    return _LOCAL_CACHE
+
+
+def is_cache_error(error):
+    """Return whether a bulk writer error is about a cache document."""
+    return error.get("index") == _INDEX
+
+
+def get_key(f):
+    return f.get("md5") or f["id"]
+
+
+def get_many(files):
+    """Look up several parsed junit files at once, return them by key.
+
+    The files parsed by this process are taken from memory and the local
+    cache is consulted, if any, before reading the others with one mget.
+    """
+    init_index()
+    keys = list(dict.fromkeys(get_key(f) for f in files))
+    parsed = {}
+    with _LOCK:
+        for key in keys:
+            future = _PARSED.get(key)
+            if future is not None and future.done() and not future.exception():
+                parsed[key] = future.result()
+    cache = get_local_cache()
+    if cache is not None:
+        for key in keys:
+            if key not in parsed:
+                value = cache.get(key)
+                if value is not None:
+                    parsed[key] = value
+    missing_keys = [key for key in keys if key not in parsed]
+    docs = es.mget(
+        _INDEX, missing_keys, source_includes=["testsuites", "junit_content"]
+    )
+    for key, doc in docs.items():
+        parsed[key] = {
+            "testsuites": doc["testsuites"],
+            "junit_content": doc["junit_content"],
+        }
+        if cache is not None:
+            cache.set(key, parsed[key])
+    return parsed
+
+
+def _forget(key, future):
+    if _PARSED.get(key) is future:
+        del _PARSED[key]
+        _PARSED_SIZES.pop(key, None)
+
+
+def _evict():
+    """Forget the oldest parsed files beyond the memory bound."""
+    max_size = config.CONFIG["JOBS_CACHE_JUNIT_MEMORY_MAX_SIZE"]
+    size = sum(_PARSED_SIZES.values())
+    for key in list(_PARSED_SIZES):
+        if size <= max_size:
+            break
+        size -= _PARSED_SIZES[key]
+        _forget(key, _PARSED[key])
+
+
+def _sent(key, future):
+    with _LOCK:
+        _forget(key, future)
+
+
+def get_or_parse(f, parse, writer, cached):
+    """Return the parsed junit file f, parse(f) is only called on a miss.
+
+    cached holds the files looked up with get_many(). The parsed file is a
+    dict with the junit_parser.parse_junit_file() testsuites and
+    junit_content, it is written to the index through writer.
+    """
+    key = get_key(f)
+    if key in cached:
+        _count("hits")
+        return cached[key]
+    with _LOCK:
+        future = _PARSED.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = concurrent.futures.Future()
+            _PARSED[key] = future
+        else:
+            _PARSED.move_to_end(key)
+    if not is_owner:
+        _count("hits" if future.done() else "waits")
+        return future.result()
+
+    try:
+        parsed = parse(f)
+    except Exception as e:
+        with _LOCK:
+            _forget(key, future)
+        future.set_exception(e)
+        raise
+    _count("misses")
+    future.set_result(parsed)
+    with _LOCK:
+        if _PARSED.get(key) is future:
+            _PARSED_SIZES[key] = f.get("size") or 0
+            _evict()
+    doc = {"md5": f.get("md5"), "created_at": f.get("created_at")}
+    doc.update(parsed)
+    # the parsed file is read from the index once its document is sent
+    writer.index(_INDEX, doc, key, on_sent=lambda: _sent(key, future))
+    cache = get_local_cache()
+    if cache is not None:
+        cache.set(key, parsed)
+    return parsed
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import logging
+
+from xml.etree import ElementTree
+from xml.parsers.expat import errors as xml_errors
+from datetime import timedelta
+
+from dci_analytics import config
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+logger = logging.getLogger(__name__)
+
+_ETREE_NO_ELEMENTS = xml_errors.codes[xml_errors.XML_ERROR_NO_ELEMENTS]
+# libxml2 errors matching the expat "no element found" error: empty
+# document, no root element and truncated document
+_LXML_NO_ELEMENTS = (1, 4, 77)
+
+
+class ParseError(Exception):
+    def __init__(self, message, no_elements=False):
+        super(ParseError, self).__init__(message)
+        self.no_elements = no_elements
+
+
+class _FirstByteReader(object):
+    """Remember the first significant byte read from a binary stream."""
+
+    def __init__(self, file_descriptor):
+        self.file_descriptor = file_descriptor
+        self.first_byte = None
+
+    def read(self, size=-1):
+        data = self.file_descriptor.read(size)
+        if self.first_byte is None:
+            stripped = data.lstrip(b"\xef\xbb\xbf \t\r\n")
+            if stripped:
+                self.first_byte = stripped[:1]
+        return data
+
+
+def _etree_iter_testsuites(file_descriptor):
+    try:
+        for _, element in ElementTree.iterparse(file_descriptor):
+            if element.tag == "testsuite":
+                yield element
+                element.clear()
+    except ElementTree.ParseError as e:
+        raise ParseError(str(e), no_elements=e.code == _ETREE_NO_ELEMENTS)
+
+
+def _lxml_iter_testsuites(file_descriptor):
+    file_descriptor = _FirstByteReader(file_descriptor)
+    try:
+        for _, element in lxml_etree.iterparse(
+            file_descriptor,
+            tag="testsuite",
+            huge_tree=True,
+            remove_comments=True,
+            remove_pis=True,
+        ):
+            yield element
+            element.clear()
+            # the testcases of a parent testsuite are still needed
+            parent = element.getparent()
+            if parent is not None and parent.tag != "testsuite":
+                while element.getprevious() is not None:
+                    del parent[0]
+    except lxml_etree.XMLSyntaxError as e:
+        # expat does not report a document not starting with an element
+        # as empty, unlike libxml2
+        no_elements = e.code in _LXML_NO_ELEMENTS and (
+            e.code != 4 or file_descriptor.first_byte in (None, b"<")
+        )
+        raise ParseError(str(e), no_elements=no_elements)
+
+
+_BACKENDS = {
+    "etree": _etree_iter_testsuites,
+    "lxml": _lxml_iter_testsuites,
+}
+
+
+def get_backend_name():
+    backend = config.CONFIG["JUNIT_XML_PARSER"]
+    if backend == "lxml" and lxml_etree is None:
+        logger.warning("lxml is not installed, using the etree junit parser")
+        return "etree"
+    if backend not in _BACKENDS:
+        raise ValueError("unknown junit parser '%s'" % backend)
+    return backend
+
+
+def iter_testsuites(file_descriptor, backend=None):
+    """Yield the testsuite elements of a binary junit stream.
+
+    Each element is cleared once the next one is requested, ParseError is
+    raised if the document is not valid, with no_elements set if it does
+    not contain any element.
+    """
+    backend = backend or get_backend_name()
+    return _BACKENDS[backend](file_descriptor)
+
+
+def parse_time(string_value):
+    try:
+        return float(string_value)
+    except ValueError:
+        return 0.0
+
+
+def parse_properties(root):
+    properties = []
+    for child in root:
+        tag = child.tag
+        if tag != "property":
+            continue
+        property_name = child.get("name", "").strip()
+        property_value = child.get("value", "")
+        if property_name:
+            properties.append({"name": property_name, "value": property_value})
+    return properties
+
+
+def parse_testcase(testcase_xml):
+    testcase = {
+        "name": testcase_xml.get("name", ""),
+        "classname": testcase_xml.get("classname", ""),
+        "time": parse_time(testcase_xml.get("time", "0")),
+        "action": "success",
+        "message": None,
+        "type": None,
+        "value": "",
+        "stdout": None,
+        "stderr": None,
+        "properties": [],
+    }
+    for testcase_child in testcase_xml:
+        tag = testcase_child.tag
+        if tag not in ["skipped", "error", "failure"]:
+            continue
+        testcase["action"] = tag
+        testcase["message"] = testcase_child.get("message", None)
+        testcase["type"] = testcase_child.get("type", None)
+        testcase_child.clear()
+    return testcase
+
+
+def parse_testsuite(testsuite_xml):
+    testsuite = {
+        "id": 0,
+        "name": testsuite_xml.get("name", ""),
+        "tests": 0,
+        "failures": 0,
+        "errors": 0,
+        "skipped": 0,
+        "success": 0,
+        "time": 0,
+        "testcases": [],
+        "properties": [],
+    }
+    testsuite_duration = timedelta(seconds=0)
+    for testcase_xml in testsuite_xml:
+        tag = testcase_xml.tag
+        if tag == "testcase":
+            testcase = parse_testcase(testcase_xml)
+            testsuite_duration += timedelta(seconds=testcase["time"])
+            testsuite["tests"] += 1
+            action = testcase["action"]
+            if action == "skipped":
+                testsuite["skipped"] += 1
+            elif action == "error":
+                testsuite["errors"] += 1
+            elif action == "failure":
+                testsuite["failures"] += 1
+            else:
+                testsuite["success"] += 1
+            testsuite["testcases"].append(testcase)
+        elif tag == "properties":
+            testsuite["properties"] = parse_properties(testcase_xml)
+    testsuite["time"] = testsuite_duration.total_seconds()
+    return testsuite
+
+
+def _add_testcases_durations(testsuite, res):
+    for tc in testsuite:
+        if tc.tag != "testcase":
+            continue
+        classname = tc.get("classname")
+        name = tc.get("name")
+        if not classname or not name:
+            continue
+        key = "%s/%s" % (classname, name)
+        key = key.strip()
+        key = key.replace(",", "_")
+        time = tc.get("time")
+        if time:
+            try:
+                res[key] = float(time)
+            except Exception:
+                res[key] = -1.0
+        else:
+            res[key] = -1.0
+
+
+def parse_junit_file(file_descriptor, filename, backend=None):
+    """Parse a junit file once for all the synchronizers.
+
+    Return the testsuites, None if the file is not valid, and the testcases
+    durations by "classname/name".
+    """
+    testsuites = []
+    junit_content = dict()
+    try:
+        for element in iter_testsuites(file_descriptor, backend):
+            _add_testcases_durations(element, junit_content)
+            testsuite = parse_testsuite(element)
+            testsuite["id"] = len(testsuites)
+            testsuites.append(testsuite)
+    except ParseError as e:
+        logger.error("ParseError %s: %s" % (filename, str(e)))
+        testsuites = [] if e.no_elements else None
+    return {"testsuites": testsuites, "junit_content": junit_content}
+
+
+def parse_junit_content(content, filename, backend=None):
+    """Parse a junit file content, run in the parsers processes."""
+    return parse_junit_file(io.BytesIO(content), filename, backend)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache(object):
+    """A size bounded cache of JSON values in a local SQLite file.
+
+    The values are stored compressed, the least recently used ones are
+    evicted once the stored values are larger than max_size bytes.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed_at REAL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+        )
+        self.size = self._get_size()
+
+    def _get_size(self):
+        row = self._connection.execute("SELECT SUM(size) FROM entries").fetchone()
+        return row[0] or 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value):
+        value = zlib.compress(json.dumps(value).encode("utf-8"))
+        if len(value) > self.max_size:
+            return
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self.size += len(value)
+            if self.size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # other processes may share the file, the real size is read again,
+        # the entries are evicted down to 90% of the size to not evict on
+        # every write
+        self.size = self._get_size()
+        target_size = self.max_size * 0.9
+        evicted = []
+        cursor = self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at, rowid"
+        )
+        for key, size in cursor:
+            if self.size <= target_size:
+                break
+            evicted.append((key,))
+            self.size -= size
+        cursor.close()
+        self._connection.execute("BEGIN")
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self._connection.execute("COMMIT")
+        logger.debug(
+            "%s: %s entries evicted, size %s" % (self.path, len(evicted), self.size)
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def open_cache(directory, name, max_size):
+    os.makedirs(directory, exist_ok=True)
+    return LocalCache(os.path.join(directory, "%s.sqlite" % name), max_size)
@@ -21,11 +21,14 @@ from dci.analytics import access_data_layer as a_d_l
 from dci_analytics import elasticsearch as es
 from dci_analytics import dci_db
 from dci_analytics import config
+from dci_analytics.synchronizers import engine
 
 
 logger = logging.getLogger(__name__)
 
 _ES_URL = config.CONFIG.get("ELASTICSEARCH_URL")
+# to increment when the tasks_components_coverage mapping changes
+_MAPPING_VERSION = 1
 
 
 def format_component_coverage(component, team_id, job=None):
@@ -52,23 +55,28 @@ def format_component_coverage(component, team_id, job=None):
     return res
 
 
-def update_component_coverage(job, component_coverage):
-    data = {}
+# append the job to the success or failed jobs of the coverage, unless it
+# is already there, the document is created from the upsert if missing
+_APPEND_JOB_SCRIPT = """
+def jobs = ctx._source[params.field];
+if (jobs == null) {
+  ctx._source[params.field] = [params.job];
+} else if (jobs.stream().anyMatch(j -> j.id == params.job.id)) {
+  ctx.op = 'noop';
+} else {
+  jobs.add(params.job);
+}
+"""
+
+
+def get_component_coverage_update(job):
+    """Return the script params appending the job to a component coverage."""
     _job = {"id": job["id"], "created_at": job["created_at"], "name": job["name"]}
-    if job["status"] == "success":
-        success_job_ids = {cc["id"] for cc in component_coverage["success_jobs"]}
-        if job["id"] not in success_job_ids:
-            data["success_jobs"] = component_coverage["success_jobs"] + [_job]
-            return True, data
-    else:
-        failed_job_ids = {cc["id"] for cc in component_coverage["failed_jobs"]}
-        if job["id"] not in failed_job_ids:
-            data["failed_jobs"] = component_coverage["failed_jobs"] + [_job]
-            return True, data
-    return False, data
-
-
-def process(job):
+    field = "success_jobs" if job["status"] == "success" else "failed_jobs"
+    return {"field": field, "job": _job}
+
+
+def process(job, writer):
     components = dict()
     job_components = job["components"]
     for c in job_components:
@@ -77,33 +85,21 @@ def process(job):
         for team in (job["team_id"], "red_hat"):
             f_c = format_component_coverage(c, team, job)
             _id = "%s-%s" % (team, f_c["id"])
-            doc = es.get("tasks_components_coverage", _id)
-            if not doc:
-                es.push("tasks_components_coverage", f_c, _id)
-            else:
-                do_update, data = update_component_coverage(job, doc)
-                if do_update:
-                    es.update("tasks_components_coverage", data, _id)
+            writer.script_upsert(
+                "tasks_components_coverage",
+                _id,
+                _APPEND_JOB_SCRIPT,
+                get_component_coverage_update(job),
+                f_c,
+            )
     return components
 
 
-def _sync(unit, amount):
-    json = {
-        "properties": {
-            "topic_id": {"type": "keyword"},
-            "team_id": {"type": "keyword"},
-            "type": {"type": "keyword"},
-        }
-    }
-    es.init_index("tasks_components_coverage", json=json)
+def _get_all_components(unit, amount):
     session_db = dci_db.get_session_db()
     limit = 100
     offset = 0
     all_components = dict()
-    components_processed_ids = set()
-    components_processed = dict()
-
-    # get all components within the timeframe
     while True:
         components = a_d_l.get_components(
             session_db, offset, limit, unit=unit, amount=amount
@@ -113,46 +109,60 @@ def _sync(unit, amount):
         for c in components:
             all_components[c["id"]] = c
         offset += limit
+    session_db.close()
+    return all_components
 
-    # process all the jobs within the same timeframe
-    offset = 0
-    while True:
-        jobs = a_d_l.get_jobs(session_db, offset, limit, unit=unit, amount=amount)
-        if not jobs:
-            break
-        for job in jobs:
-            try:
-                logger.info("process job %s" % job["id"])
-                current_components_processed = process(job)
-                if current_components_processed:
-                    components_processed.update(current_components_processed)
-            except Exception as e:
-                logger.error(
-                    "error while processing job '%s': %s" % (job["id"], str(e))
-                )
-        offset += limit
 
-    # if a component is not in the component_processsed_ids set
-    # it means it has not been tested yet
-    # action: push it on elasticsearch without jobs
-    components_processed_ids = set(components_processed.keys())
-    for _, v in all_components.items():
-        if v["id"] not in components_processed_ids:
-            if v["team_id"]:
-                f_c = format_component_coverage(v, v["team_id"])
-                es.push("tasks_components_coverage", f_c, v["id"])
-            else:
-                f_c = format_component_coverage(v, "red_hat")
-                es.push("tasks_components_coverage", f_c, "red_hat-%s" % v["id"])
+class ComponentsCoverageSynchronizer(engine.Synchronizer):
+    name = "components_coverage"
 
-    session_db.close()
+    def start(self):
+        json = {
+            "properties": {
+                "topic_id": {"type": "keyword"},
+                "team_id": {"type": "keyword"},
+                "type": {"type": "keyword"},
+            }
+        }
+        es.init_index("tasks_components_coverage", json=json, version=_MAPPING_VERSION)
+        # get all components within the timeframe
+        self.all_components = _get_all_components(self.unit, self.amount)
+        self.components_processed = dict()
+
+    def process(self, job):
+        current_components_processed = process(job, self.writer)
+        if current_components_processed:
+            self.components_processed.update(current_components_processed)
+
+    def finish(self):
+        # if a component is not in the component_processsed_ids set
+        # it means it has not been tested yet
+        # action: push it on elasticsearch without jobs
+        components_processed_ids = set(self.components_processed.keys())
+        for _, v in self.all_components.items():
+            if v["id"] not in components_processed_ids:
+                if v["team_id"]:
+                    f_c = format_component_coverage(v, v["team_id"])
+                    self.writer.create("tasks_components_coverage", f_c, v["id"])
+                else:
+                    f_c = format_component_coverage(v, "red_hat")
+                    self.writer.create(
+                        "tasks_components_coverage", f_c, "red_hat-%s" % v["id"]
+                    )
+        super(ComponentsCoverageSynchronizer, self).finish()
+
+
+def get_synchronizer(synchronization_type):
+    if synchronization_type == "full":
+        return ComponentsCoverageSynchronizer("weeks", 24)
+    return ComponentsCoverageSynchronizer("hours", 6, incremental=True)
 
 
 def partial(_lock_synchronization):
-    _sync("hours", 6)
+    engine.run([get_synchronizer("partial")])
     _lock_synchronization.release()
 
 
 def full(_lock_synchronization):
-    _sync("weeks", 24)
+    engine.run([get_synchronizer("full")])
     _lock_synchronization.release()
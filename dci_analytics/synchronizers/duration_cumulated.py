@@ -17,10 +17,8 @@
 
 
 from datetime import datetime as dt
-from dci.analytics import access_data_layer as a_d_l
 
-from dci_analytics import elasticsearch as es
-from dci_analytics import dci_db
+from dci_analytics.synchronizers import engine
 
 import logging
 
@@ -79,39 +77,31 @@ def _format_data(job, tasks_duration_cumulated):
     }
 
 
-def _process(job):
+def _process(job, writer):
     tasks = _get_sorted_tasks(job)
     tasks_duration_cumulated = _get_tasks_duration_cumulated(tasks)
     data = _format_data(job, tasks_duration_cumulated)
-    es.push("tasks_duration_cumulated", data, data["job_id"])
-
-
-def _sync(unit, amount):
-    session_db = dci_db.get_session_db()
-    limit = 100
-    offset = 0
-    while True:
-        jobs = a_d_l.get_jobs(session_db, offset, limit, unit=unit, amount=amount)
-        if not jobs:
-            break
-        for job in jobs:
-            logger.info("process job %s" % job["id"])
-            try:
-                _process(job)
-            except Exception as e:
-                logger.error(
-                    "error while processing job '%s': %s" % (job["id"], str(e))
-                )
-        offset += limit
-
-    session_db.close()
+    writer.create("tasks_duration_cumulated", data, data["job_id"])
+
+
+class DurationCumulatedSynchronizer(engine.Synchronizer):
+    name = "duration_cumulated"
+
+    def process(self, job):
+        _process(job, self.writer)
+
+
+def get_synchronizer(synchronization_type):
+    if synchronization_type == "full":
+        return DurationCumulatedSynchronizer("weeks", 24)
+    return DurationCumulatedSynchronizer("hours", 6, incremental=True)
 
 
 def partial(_lock_synchronization):
-    _sync("hours", 6)
+    engine.run([get_synchronizer("partial")])
     _lock_synchronization.release()
 
 
 def full(_lock_synchronization):
-    _sync("weeks", 24)
+    engine.run([get_synchronizer("full")])
     _lock_synchronization.release()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime as dt
+from datetime import timedelta
+
+import copy
+import logging
+import queue
+import threading
+
+from dci_analytics import config
+from dci_analytics import elasticsearch as es
+from dci_analytics import dci_db
+from dci_analytics import jobs_scanner
+from dci_analytics import junit_cache
+from dci_analytics.synchronizers import watermarks
+
+
+logger = logging.getLogger(__name__)
+
+
+class Synchronizer(object):
+    """A synchronizer fed with the jobs of one time frame by the engine.
+
+    start() is called before the scan, process() once for each job the
+    synchronizer accepts and finish() after the scan, with failed set if
+    the scan did not complete. Each synchronizer writes its documents
+    through its own bulk writer.
+
+    An incremental synchronizer only gets the jobs updated since its
+    watermark, which is moved to the last job update once the whole scan
+    has been processed without error. Without watermark, the jobs updated
+    within the unit/amount time frame are processed.
+    """
+
+    name = None
+    status = None
+
+    def __init__(self, unit, amount, incremental=False):
+        self.unit = unit
+        self.amount = amount
+        self.delta = timedelta(**{unit: amount})
+        self.incremental = incremental
+        self.created_since = None
+        self.updated_since = None
+        self.max_updated_at = None
+        self.failed = False
+        self.errors = 0
+        self._errors_lock = threading.Lock()
+        self.writer = es.BulkWriter()
+
+    def start(self):
+        pass
+
+    def accepts(self, job):
+        if self.status is not None and job["status"] != self.status:
+            return False
+        if self.created_since is not None and job["created_at"] < self.created_since:
+            return False
+        if self.updated_since is not None and job["updated_at"] < self.updated_since:
+            return False
+        return True
+
+    def process(self, job):
+        raise NotImplementedError()
+
+    def process_job(self, job):
+        logger.info("%s: process job %s" % (self.name, job["id"]))
+        try:
+            self.process(job)
+        except Exception as e:
+            logger.error(
+                "%s: error while processing job '%s': %s"
+                % (self.name, job["id"], str(e))
+            )
+            with self._errors_lock:
+                self.errors += 1
+
+    def process_jobs(self, jobs):
+        for job in jobs:
+            self.process_job(job)
+
+    def finish(self):
+        self.writer.flush()
+
+
+def _start(synchronizers):
+    started = []
+    for s in synchronizers:
+        try:
+            s.start()
+            started.append(s)
+        except Exception as e:
+            logger.error("%s: error while starting: %s" % (s.name, str(e)))
+    return started
+
+
+def _finish(synchronizers):
+    for s in synchronizers:
+        try:
+            s.finish()
+        except Exception as e:
+            logger.error("%s: error while finishing: %s" % (s.name, str(e)))
+
+
+_END_OF_PAGES = object()
+
+
+def _prefetch(pages, depth):
+    """Iterate over pages while a thread reads up to depth pages ahead."""
+    if depth <= 0:
+        yield from pages
+        return
+
+    pages_queue = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def _put(item):
+        while not stopped.is_set():
+            try:
+                pages_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for page in pages:
+                if not _put(page):
+                    return
+            _put(_END_OF_PAGES)
+        except Exception as e:
+            _put(e)
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pages_queue.get()
+            if item is _END_OF_PAGES:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def _get_blocking_errors(s):
+    """Return the writer errors of s which must hold its watermark back.
+
+    The junit files cache documents are only an optimization and the
+    documents rejected for good would hold the watermark forever, only the
+    writes which may succeed on the next synchronization are kept.
+    """
+    errors = []
+    for error in s.writer.errors:
+        if junit_cache.is_cache_error(error):
+            continue
+        if not es.is_transient_error(error):
+            logger.error(
+                "%s: document %s rejected: %s"
+                % (s.name, error.get("id"), error.get("error"))
+            )
+            continue
+        errors.append(error)
+    return errors
+
+
+def _advance_watermarks(synchronizers, scan_started_at):
+    for s in synchronizers:
+        if s.max_updated_at is None:
+            continue
+        blocking_errors = _get_blocking_errors(s)
+        if s.failed or s.errors or blocking_errors:
+            logger.warning(
+                "%s: watermark not advanced, %s jobs and %s documents failed"
+                % (s.name, s.errors, len(blocking_errors))
+            )
+            continue
+        # the pages are read in creation order, a job of an already read
+        # page may have been updated during the scan while a later page
+        # holds a more recent update, the watermark must not pass the
+        # start of the scan or that update would never be synchronized
+        watermarks.advance(s.name, min(s.max_updated_at, scan_started_at))
+
+
+def _dispatch(synchronizers, jobs):
+    for s in synchronizers:
+        accepted_jobs = [j for j in jobs if s.accepts(j)]
+        if not accepted_jobs:
+            continue
+        max_updated_at = max(j["updated_at"] for j in accepted_jobs)
+        if s.max_updated_at is None or s.max_updated_at < max_updated_at:
+            s.max_updated_at = max_updated_at
+        # the synchronizers modify the jobs they process
+        if len(synchronizers) > 1:
+            accepted_jobs = copy.deepcopy(accepted_jobs)
+        try:
+            s.process_jobs(accepted_jobs)
+        except Exception as e:
+            logger.error("%s: error while processing jobs: %s" % (s.name, str(e)))
+            # the jobs of the page were not processed, the watermark must
+            # not move past them
+            with s._errors_lock:
+                s.errors += len(accepted_jobs)
+
+
+def run(synchronizers):
+    """Scan the jobs once and dispatch them to all the synchronizers."""
+    synchronizers = _start(synchronizers)
+    if not synchronizers:
+        return
+
+    widest = max(synchronizers, key=lambda s: s.delta)
+    # the jobs dates are stored in UTC
+    now = dt.utcnow()
+    updated_since = None
+    if all(s.incremental for s in synchronizers):
+        for s in synchronizers:
+            since = watermarks.get_updated_since(s.name)
+            if since is None:
+                since = now - s.delta
+            s.updated_since = since.isoformat()
+            if updated_since is None or since < updated_since:
+                updated_since = since
+            logger.info("%s: synchronize jobs updated since %s" % (s.name, since))
+    else:
+        for s in synchronizers:
+            if s.delta < widest.delta:
+                s.created_since = (now - s.delta).isoformat()
+    statuses = {s.status for s in synchronizers}
+    status = statuses.pop() if len(statuses) == 1 else None
+
+    session_db = dci_db.get_session_db()
+    # the next pages are read from the database while the current one is
+    # processed, the session is only used by the prefetching thread
+    pages = _prefetch(
+        jobs_scanner.iter_jobs(
+            session_db,
+            widest.unit,
+            widest.amount,
+            limit=100,
+            status=status,
+            updated_since=updated_since,
+        ),
+        config.CONFIG["SYNC_PREFETCH_PAGES"],
+    )
+    try:
+        for jobs in pages:
+            _dispatch(synchronizers, jobs)
+    except Exception as e:
+        logger.error("error while scanning the jobs: %s" % str(e))
+        for s in synchronizers:
+            s.failed = True
+    finally:
+        pages.close()
+        session_db.close()
+    _finish(synchronizers)
+    _advance_watermarks(synchronizers, now.isoformat())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+
+from dci_analytics.synchronizers import components_coverage
+from dci_analytics.synchronizers import duration_cumulated
+from dci_analytics.synchronizers import engine
+from dci_analytics.synchronizers import jobs
+from dci_analytics.synchronizers import junit
+from dci_analytics.synchronizers import pipelines
+
+
+logger = logging.getLogger(__name__)
+
+# the api takes the locks of these synchronizers when running a fanout
+_SYNCHRONIZERS = (
+    duration_cumulated,
+    components_coverage,
+    junit,
+    pipelines,
+    jobs,
+)
+
+
+def _get_synchronizers(synchronization_type):
+    synchronizers = []
+    for s in _SYNCHRONIZERS:
+        try:
+            synchronizers.append(s.get_synchronizer(synchronization_type))
+        except Exception as e:
+            logger.error("error while creating synchronizer %s: %s" % (s, str(e)))
+    return synchronizers
+
+
+def partial(_lock_synchronization):
+    engine.run(_get_synchronizers("partial"))
+    _lock_synchronization.release()
+
+
+def full(_lock_synchronization):
+    engine.run(_get_synchronizers("full"))
+    _lock_synchronization.release()
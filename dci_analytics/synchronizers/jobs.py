@@ -17,171 +17,127 @@
 
 import json
 import logging
+import multiprocessing
+import threading
 
 import concurrent.futures
 
-from dci.analytics import access_data_layer as a_d_l
 from dci_analytics import elasticsearch as es
-from dci_analytics import dci_db
 from dci_analytics import config
+from dci_analytics import dci_files
+from dci_analytics import junit_cache
+from dci_analytics import junit_parser
+from dci_analytics.synchronizers import engine
 
 
 from dciclient.v1.api import context
 
-import io
-
-from xml.etree import ElementTree
-from xml.parsers.expat import errors as xml_errors
-from datetime import timedelta
-
 
 logger = logging.getLogger(__name__)
 
 _INDEX = "jobs"
-_INDEX_JUNIT_CACHE = "jobs_cache_junit"
-
-
-def parse_time(string_value):
-    try:
-        return float(string_value)
-    except ValueError:
-        return 0.0
-
+_MIME_JUNIT = "application/junit"
+_MIME_EXTRA = "application/dci-analytics+json"
+# to increment when the jobs index mapping changes
+_MAPPING_VERSION = 1
+
+# bound the number of concurrent downloads from the DCI API and of
+# concurrent writes to Elasticsearch, independently of the workers count
+_DCI_API_SEMAPHORE = threading.BoundedSemaphore(
+    config.CONFIG["DCI_API_MAX_CONCURRENCY"]
+)
+_ES_WRITES_SEMAPHORE = threading.BoundedSemaphore(
+    config.CONFIG["JOBS_SYNC_MAX_ES_WRITES"]
+)
+
+
+def parse_junit_file(api_conn, f, parser_pool=None):
+    """Parse a junit file while it is downloaded from the DCI API.
+
+    With a parser pool, the file is downloaded first and parsed in the
+    pool processes.
+    """
+    with _DCI_API_SEMAPHORE:
+        with dci_files.open_file(api_conn, f["id"]) as file_descriptor:
+            if parser_pool is None:
+                return junit_parser.parse_junit_file(file_descriptor, f["name"])
+            content = file_descriptor.read()
+    result = parser_pool.apply_async(
+        junit_parser.parse_junit_content,
+        (content, f["name"], junit_parser.get_backend_name()),
+    )
+    return result.get()
 
-def parse_properties(root):
-    properties = []
-    for child in root:
-        tag = child.tag
-        if tag != "property":
-            continue
-        property_name = child.get("name", "").strip()
-        property_value = child.get("value", "")
-        if property_name:
-            properties.append({"name": property_name, "value": property_value})
-    return properties
-
-
-def parse_testcase(testcase_xml):
-    testcase = {
-        "name": testcase_xml.attrib.get("name", ""),
-        "classname": testcase_xml.attrib.get("classname", ""),
-        "time": parse_time(testcase_xml.attrib.get("time", "0")),
-        "action": "success",
-        "message": None,
-        "type": None,
-        "value": "",
-        "stdout": None,
-        "stderr": None,
-        "properties": [],
-    }
-    for testcase_child in testcase_xml:
-        tag = testcase_child.tag
-        if tag not in ["skipped", "error", "failure"]:
-            continue
-        testcase["action"] = tag
-        testcase["message"] = testcase_child.get("message", None)
-        testcase["type"] = testcase_child.get("type", None)
-        testcase_child.clear()
-    return testcase
-
-
-def parse_testsuite(testsuite_xml):
-    testsuite = {
-        "id": 0,
-        "name": testsuite_xml.attrib.get("name", ""),
-        "tests": 0,
-        "failures": 0,
-        "errors": 0,
-        "skipped": 0,
-        "success": 0,
-        "time": 0,
-        "testcases": [],
-        "properties": [],
-    }
-    testsuite_duration = timedelta(seconds=0)
-    for testcase_xml in testsuite_xml:
-        tag = testcase_xml.tag
-        if tag == "testcase":
-            testcase = parse_testcase(testcase_xml)
-            testsuite_duration += timedelta(seconds=testcase["time"])
-            testsuite["tests"] += 1
-            action = testcase["action"]
-            if action == "skipped":
-                testsuite["skipped"] += 1
-            elif action == "error":
-                testsuite["errors"] += 1
-            elif action == "failure":
-                testsuite["failures"] += 1
-            else:
-                testsuite["success"] += 1
-            testsuite["testcases"].append(testcase)
-        elif tag == "properties":
-            testsuite["properties"] = parse_properties(testcase_xml)
-    testsuite["time"] = testsuite_duration.total_seconds()
-    return testsuite
-
-
-def parse_junit(file_descriptor):
-    try:
-        testsuites = []
-        nb_of_testsuites = 0
-        for event, element in ElementTree.iterparse(file_descriptor):
-            if element.tag == "testsuite":
-                testsuite = parse_testsuite(element)
-                testsuite["id"] = nb_of_testsuites
-                nb_of_testsuites += 1
-                testsuites.append(testsuite)
-                element.clear()
-        return testsuites
-    except ElementTree.ParseError as parse_error:
-        error_code_no_elements = xml_errors.codes[xml_errors.XML_ERROR_NO_ELEMENTS]
-        if parse_error.code == error_code_no_elements:
-            return []
-        raise parse_error
-
-
-def get_file_content(api_conn, f_id):
-    _config = config.CONFIG
-    api_url = _config["DCI_CS_URL"]
-    r = api_conn.session.get(f"{api_url}/api/v2/files/{f_id}/content")
-    return r.content
 
+def read_file(api_conn, f, parser_pool=None, writer=None, junit_files=None):
+    """Read a file, the junit files are looked up in the junit cache first.
 
-def get_tests_from_api(files, api_conn):
+    junit_files are the junit files looked up with junit_cache.get_many(),
+    the junit files parsed are written to the cache through writer.
+    """
+    if f["mime"] == _MIME_JUNIT:
+        parsed = junit_cache.get_or_parse(
+            f,
+            lambda f: parse_junit_file(api_conn, f, parser_pool),
+            writer,
+            junit_files,
+        )
+        return parsed["testsuites"]
+    with _DCI_API_SEMAPHORE:
+        with dci_files.open_file(api_conn, f["id"]) as file_descriptor:
+            return parse_json(file_descriptor.read())
+
+
+def get_parser_pool():
+    """Return a pool of processes parsing the junit files, if configured."""
+    processes = config.CONFIG["JUNIT_PARSER_PROCESSES"]
+    if processes <= 0:
+        return None
+    # the synchronizations are multithreaded, forking is not safe, and
+    # ProcessPoolExecutor only accepts a start method from python 3.7
+    return multiprocessing.get_context("spawn").Pool(processes)
+
+
+def get_junit_files(jobs):
+    return [
+        f
+        for job in jobs
+        for f in job["files"]
+        if f["state"] == "active" and f["mime"] == _MIME_JUNIT
+    ]
+
+
+def read_files(api_conn, files, mimes, parser_pool=None, writer=None, junit_files=None):
+    """Download and parse concurrently the active files of the given mime types.
+
+    Return the (file, parsed content) couples in the files order, the
+    parsed content is None if the file could not be read.
+    """
+    files = [f for f in files if f["state"] == "active" and f["mime"] in mimes]
+    if not files:
+        return []
+    max_workers = min(len(files), config.CONFIG["JOBS_SYNC_MAX_FILES_DOWNLOADS"])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(read_file, api_conn, f, parser_pool, writer, junit_files)
+            for f in files
+        ]
+    files_read = []
+    for f, future in zip(files, futures):
+        try:
+            files_read.append((f, future.result()))
+        except Exception as e:
+            logger.error(f"Exception while reading file {f['id']}: {e}")
+            files_read.append((f, None))
+    return files_read
+
+
+def get_tests(files_read):
     tests = []
-    for f in files:
-        if f["state"] != "active":
+    for f, testsuites in files_read:
+        if f["mime"] != _MIME_JUNIT or testsuites is None:
             continue
-        if f["mime"] == "application/junit":
-            test = {"name": f["name"], "file_id": f["id"]}
-            try:
-                file_content = get_file_content(api_conn, f["id"])
-                file_descriptor = io.StringIO(file_content.decode("utf-8"))
-                test["testsuites"] = parse_junit(file_descriptor)
-                tests.append(test)
-            except Exception as e:
-                logger.error(f"Exception during sync: {e}")
-    return tests
-
-
-def get_tests_from_cache(job_id):
-    doc = es.get(_INDEX_JUNIT_CACHE, job_id)
-    if doc:
-        return doc["tests"]
-    return
-
-
-def get_tests(job, api_conn):
-    tests = get_tests_from_cache(job["id"])
-    if tests:
-        return tests
-    else:
-        tests = get_tests_from_api(job["files"], api_conn)
-        es.push(
-            _INDEX_JUNIT_CACHE,
-            {"created_at": job["created_at"], "tests": tests},
-            job["id"],
-        )
+        tests.append({"name": f["name"], "file_id": f["id"], "testsuites": testsuites})
     return tests
 
 
@@ -206,35 +162,49 @@ def parse_json(file_content):
     return clean_doted_keys(json_content)
 
 
-def get_extra_data(job, api_conn):
+def get_extra_data(job, api_conn, files_read=None):
+    if files_read is None:
+        files_read = read_files(api_conn, job["files"], [_MIME_EXTRA])
     extra = []
-    for f in job["files"]:
-        if f["state"] != "active":
+    for f, file_json in files_read:
+        if f["mime"] != _MIME_EXTRA or file_json is None:
             continue
-        if f["mime"] == "application/dci-analytics+json":
-            try:
-                file_content = get_file_content(api_conn, f["id"])
-                file_json = parse_json(file_content)
-                extra.append(file_json)
-            except Exception as e:
-                logger.error(f"Exception during getting extra data: {e}")
+        extra.append(file_json)
     return extra
 
 
-def process(index, job, api_conn):
+def process(index, job, api_conn, writer, parser_pool=None, junit_files=None):
+    """Index a job, junit_files are its junit files if already looked up."""
     _id = job["id"]
-    job["tests"] = get_tests(job, api_conn)
-    job["extra"] = get_extra_data(job, api_conn)
+    if junit_files is None:
+        junit_files = junit_cache.get_many(get_junit_files([job]))
+    # only the junit files missing from the cache are downloaded, all the
+    # files needed by the job are read at once
+    files_read = read_files(
+        api_conn,
+        job["files"],
+        [_MIME_JUNIT, _MIME_EXTRA],
+        parser_pool,
+        writer,
+        junit_files,
+    )
+    job["tests"] = get_tests(files_read)
+    job["extra"] = get_extra_data(job, api_conn, files_read)
 
-    doc = es.get(index, _id)
-    if not doc:
-        es.push(index, job, _id)
-    else:
-        es.update(index, job, _id)
+    writer.upsert(index, job, _id)
     return job
 
 
-def update_index(index):
+def update_index(index, bulk_loading=False):
+    settings = {
+        "index.mapping.nested_objects.limit": 300000,
+        "index.mapping.total_fields.limit": 20000,
+    }
+    if bulk_loading:
+        # the index is not searched before being aliased, no need to
+        # refresh it or to replicate the writes while loading it
+        settings["index.refresh_interval"] = "-1"
+        settings["index.number_of_replicas"] = 0
     return es.update_index(
         index,
         json={
@@ -274,12 +244,20 @@ def update_index(index):
                     "extra": {"type": "nested"},
                 },
             },
-            "settings": {
-                "index.mapping.nested_objects.limit": 300000,
-                "index.mapping.total_fields.limit": 20000,
-            },
+            "settings": settings,
         },
+        version=_MAPPING_VERSION,
+    )
+
+
+def _finalize_bulk_loading(index):
+    number_of_replicas = config.CONFIG["ELASTICSEARCH_NUMBER_OF_REPLICAS"]
+    es.update_index_settings(
+        index,
+        {"index": {"refresh_interval": None, "number_of_replicas": number_of_replicas}},
     )
+    es.refresh_index(index)
+    es.forcemerge_index(index)
 
 
 def _get_api_connection():
@@ -300,73 +278,179 @@ def _get_api_connection():
         logger.error("no credentials found for the api")
 
 
-def _sync(index, unit, amount):
-
-    is_index_created = update_index(index)
-    api_conn = _get_api_connection()
-
-    session_db = dci_db.get_session_db()
-    limit = 100
-    offset = 0
-    last_job = None
-
-    if is_index_created:
-        jobs = a_d_l.get_jobs(session_db, 0, 1, unit=unit, amount=amount)
-        if len(jobs) > 0:
-            es.update_index_meta(index, first_job_date=jobs[0]["created_at"])
+class JobsSynchronizer(engine.Synchronizer):
+    name = "jobs"
+
+    def __init__(self, unit, amount, index, full=False, incremental=False):
+        super(JobsSynchronizer, self).__init__(unit, amount, incremental=incremental)
+        self.index = index
+        self.full = full
+        self.last_job = None
+        self.writer = es.BulkWriter(send_semaphore=_ES_WRITES_SEMAPHORE)
+        # job id -> junit files of the job looked up in the junit cache
+        self.junit_files = {}
+        self._junit_files_lock = threading.Lock()
+
+    def start(self):
+        self.is_index_created = update_index(self.index, bulk_loading=self.full)
+        self.api_conn = _get_api_connection()
+        # the jobs are continuously fed to a long lived pool, a slow job only
+        # holds its own worker while the others keep going
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.CONFIG["JOBS_SYNC_WORKERS"]
+        )
+        self.in_flight = threading.BoundedSemaphore(
+            config.CONFIG["JOBS_SYNC_MAX_IN_FLIGHT"]
+        )
+        # parsing the junit files is CPU bound, a full synchronization
+        # spreads it over several processes
+        self.parser_pool = get_parser_pool() if self.full else None
+
+    def process(self, job):
+        with self._junit_files_lock:
+            junit_files = self.junit_files.pop(job["id"], None)
+        process(
+            self.index,
+            job,
+            self.api_conn,
+            self.writer,
+            self.parser_pool,
+            junit_files=junit_files,
+        )
 
-    while True:
-        jobs = a_d_l.get_jobs(session_db, offset, limit, unit=unit, amount=amount)
-        if not jobs:
-            break
-        last_job = jobs[-1]
-        futures = []
-        with concurrent.futures.ThreadPoolExecutor() as executor:
+    def _job_done(self, future):
+        self.in_flight.release()
+        e = future.exception()
+        if e is not None:
+            logger.error("%s: error while processing a job: %s" % (self.name, e))
+            with self._errors_lock:
+                self.errors += 1
+
+    def process_jobs(self, jobs):
+        if self.is_index_created and self.last_job is None:
+            es.update_index_meta(self.index, first_job_date=jobs[0]["created_at"])
+        self.last_job = jobs[-1]
+        # the junit files of the whole page are looked up at once
+        junit_files = junit_cache.get_many(get_junit_files(jobs))
+        with self._junit_files_lock:
             for job in jobs:
-                try:
-                    logger.info("process job %s" % job["id"])
-                    futures.append(
-                        executor.submit(
-                            process, index=index, job=job, api_conn=api_conn
-                        )
-                    )
-                except Exception as e:
-                    logger.error(
-                        "error while processing job '%s': %s" % (job["id"], str(e))
-                    )
-            for _ in concurrent.futures.as_completed(futures):
-                pass
-        offset += limit
-
-    if last_job:
-        es.update_index_meta(index, last_job_date=last_job["updated_at"])
-    session_db.close()
-
-
-def sync_one_job(index, job):
-
+                self.junit_files[job["id"]] = junit_files
+        for job in jobs:
+            self.in_flight.acquire()
+            future = self.executor.submit(self.process_job, job)
+            future.add_done_callback(self._job_done)
+
+    def finish(self):
+        self.executor.shutdown(wait=True)
+        if self.parser_pool is not None:
+            self.parser_pool.close()
+            self.parser_pool.join()
+        super(JobsSynchronizer, self).finish()
+        if self.last_job:
+            es.update_index_meta(self.index, last_job_date=self.last_job["updated_at"])
+        if not self.full:
+            return
+        if self.failed:
+            logger.error(f"index '{self.index}' not aliased, the scan failed")
+            return
+        _finalize_bulk_loading(self.index)
+        new_alias = es.add_alias_to_index(_INDEX, self.index)
+        logger.debug(f"new alias '{new_alias}' added for index: '{self.index}'")
+        es.delete_old_indices(_INDEX, config.CONFIG["JOBS_INDEX_RETENTION"])
+
+
+def get_indexed_updated_at(index, job_ids):
+    """Return the updated_at of the jobs already in the index, by job id.
+
+    The documents are read with a real time mget, a search could miss the
+    ones written by the previous batch and not refreshed yet.
+    """
+    docs = es.mget(index, job_ids, source_includes=["updated_at"])
+    return {job_id: doc.get("updated_at") for job_id, doc in docs.items()}
+
+
+def sync_jobs(index, jobs, executor=None):
+    """Synchronize a batch of jobs with one bulk write and one meta update.
+
+    The jobs older than their indexed version are skipped, the others are
+    processed by the executor if any. Return the ids of the jobs which
+    could not be processed or written and may succeed if retried, the jobs
+    rejected by Elasticsearch are only logged.
+    """
     is_index_created = update_index(index)
+    if not is_index_created:
+        indexed_updated_at = get_indexed_updated_at(index, [j["id"] for j in jobs])
+        stale_job_ids = {
+            j["id"]
+            for j in jobs
+            if indexed_updated_at.get(j["id"])
+            and j["updated_at"] < indexed_updated_at[j["id"]]
+        }
+        for job_id in stale_job_ids:
+            logger.info(f"skip job '{job_id}', a newer version is indexed")
+        jobs = [j for j in jobs if j["id"] not in stale_job_ids]
+        if not jobs:
+            return set()
     api_conn = _get_api_connection()
 
-    if is_index_created:
-        es.update_index_meta(index, first_job_date=job["created_at"])
-
-    process(index, job, api_conn)
-
-    es.update_index_meta(index, last_job_date=job["updated_at"])
+    # the whole batch is sent at once, unless it is larger than the
+    # configured bulk size
+    writer = es.BulkWriter(
+        max_docs=len(jobs),
+        flush_interval=float("inf"),
+        send_semaphore=_ES_WRITES_SEMAPHORE,
+    )
+    junit_files = junit_cache.get_many(get_junit_files(jobs))
+
+    def _process(job):
+        try:
+            process(index, job, api_conn, writer, junit_files=junit_files)
+        except Exception as e:
+            logger.error(f"error while processing job '{job['id']}': {e}")
+            return job["id"]
+
+    results = map(_process, jobs) if executor is None else executor.map(_process, jobs)
+    to_retry = {job_id for job_id in results if job_id is not None}
+    failed = set(to_retry)
+
+    writer.flush()
+    job_ids = {job["id"] for job in jobs}
+    for error in writer.errors:
+        if "id" in error:
+            # the junit files cache documents are only an optimization
+            if error["id"] not in job_ids:
+                continue
+            error_job_ids = {error["id"]}
+        else:
+            error_job_ids = job_ids
+        failed.update(error_job_ids)
+        if es.is_transient_error(error):
+            to_retry.update(error_job_ids)
+
+    synced_jobs = [job for job in jobs if job["id"] not in failed]
+    if synced_jobs:
+        meta = {"last_job_date": max(job["updated_at"] for job in synced_jobs)}
+        if is_index_created:
+            meta["first_job_date"] = min(job["created_at"] for job in synced_jobs)
+        es.update_index_meta(index, **meta)
+    return to_retry
+
+
+def get_synchronizer(synchronization_type):
+    if synchronization_type == "full":
+        new_index_name = es.generate_new_index_name(_INDEX)
+        logger.debug(f"new index created: '{new_index_name}'")
+        return JobsSynchronizer("weeks", 52, new_index_name, full=True)
+    latest_index_alias = es.get_latest_index_alias(_INDEX)
+    logger.debug(f"latest index alias: '{latest_index_alias}'")
+    return JobsSynchronizer("hours", 6, latest_index_alias, incremental=True)
 
 
 def partial(_lock_synchronization):
-    latest_index_alias = es.get_latest_index_alias(_INDEX)
-    logger.debug(f"latest index alias: '{latest_index_alias}'")
-    _sync(latest_index_alias, "hours", 6)
+    engine.run([get_synchronizer("partial")])
     _lock_synchronization.release()
 
 
 def full(_lock_synchronization):
-    new_index_name = es.generate_new_index_name(_INDEX)
-    logger.debug(f"new index created: '{new_index_name}'")
-    _sync(new_index_name, "weeks", 52)
-    new_alias = es.add_alias_to_index("jobs", new_index_name)
-    logger.debug(f"new alias '{new_alias}' added for index: '{new_index_name}'")
+    engine.run([get_synchronizer("full")])
     _lock_synchronization.release()
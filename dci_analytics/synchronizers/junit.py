@@ -15,60 +15,34 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from xml.etree import ElementTree
-
-from dci.analytics import access_data_layer as a_d_l
-
 from dci_analytics import elasticsearch as es
-from dci_analytics import dci_db
 from dci_analytics import config
+from dci_analytics import dci_files
+from dci_analytics import junit_cache
+from dci_analytics import junit_parser
+from dci_analytics.synchronizers import engine
 
 from dciclient.v1.api import context
-from dciclient.v1.api import file as dci_file
 
-import io
 import logging
 
 
 logger = logging.getLogger()
 
+# to increment when the tasks_junit mapping changes
+_MAPPING_VERSION = 1
+
+
+def _parse_junit_file(api_conn, f):
+    with dci_files.open_file(api_conn, f["id"]) as file_descriptor:
+        return junit_parser.parse_junit_file(file_descriptor, f["name"])
 
-def junit_to_dict(file_descriptor, filename):
-    def _process_testsuite(testsuite, res):
-        for tc in testsuite:
-            if tc.tag != "testcase":
-                continue
-            classname = tc.get("classname")
-            name = tc.get("name")
-            if not classname or not name:
-                continue
-            key = "%s/%s" % (tc.get("classname"), tc.get("name"))
-            key = key.strip()
-            key = key.replace(",", "_")
-            if tc.get("time"):
-                try:
-                    res[key] = float(tc.get("time"))
-                except Exception:
-                    res[key] = -1.0
-            else:
-                res[key] = -1.0
-
-    res = dict()
-    try:
-        for _, element in ElementTree.iterparse(file_descriptor):
-            if element.tag == "testsuite":
-                _process_testsuite(element, res)
-    except ElementTree.ParseError as e:
-        logger.error("ParseError %s: %s" % (filename, str(e)))
-    return res
-
-
-def get_file_content(api_conn, f):
-    r = dci_file.content(api_conn, f["id"])
-    return r.content
-
-
-def _process_sync(api_conn, job):
+
+def _process_sync(api_conn, job, writer, junit_files=None):
+    if junit_files is None:
+        junit_files = junit_cache.get_many(
+            [f for f in job["files"] if f["mime"] == "application/junit"]
+        )
     files = []
     junit_found = False
     for f in job["files"]:
@@ -77,9 +51,10 @@ def _process_sync(api_conn, job):
         if f["mime"] == "application/junit":
             try:
                 junit_found = True
-                file_content = get_file_content(api_conn, f)
-                file_descriptor = io.StringIO(file_content.decode("utf-8"))
-                f["junit_content"] = junit_to_dict(file_descriptor, f["name"])
+                parsed = junit_cache.get_or_parse(
+                    f, lambda f: _parse_junit_file(api_conn, f), writer, junit_files
+                )
+                f["junit_content"] = parsed["junit_content"]
                 files.append(f)
             except Exception as e:
                 logger.error(f"Exception during sync: {e}")
@@ -87,59 +62,63 @@ def _process_sync(api_conn, job):
         return
     job["files"] = files
     job.pop("jobstates")
-    es.push("tasks_junit", job, job["id"])
-
-
-def _sync(unit, amount):
-    es.init_index(
-        "tasks_junit",
-        json={
-            "properties": {
-                "topic_id": {"type": "keyword"},
-                "remoteci_id": {"type": "keyword"},
-                "team_id": {"type": "keyword"},
-                "files.junit_content": {"enabled": False},
-            }
-        },
-    )
-    session_db = dci_db.get_session_db()
-    _config = config.get_config()
-    api_conn = context.build_dci_context(
-        dci_login=_config["DCI_LOGIN"],
-        dci_password=_config["DCI_PASSWORD"],
-        dci_cs_url=_config["DCI_CS_URL"],
-    )
-    limit = 10
-    offset = 0
-    while True:
-        jobs = a_d_l.get_jobs(
-            session_db, offset, limit, unit=unit, amount=amount, status="success"
+    writer.create("tasks_junit", job, job["id"])
+
+
+class JunitSynchronizer(engine.Synchronizer):
+    name = "junit"
+    status = "success"
+
+    def start(self):
+        es.init_index(
+            "tasks_junit",
+            json={
+                "properties": {
+                    "topic_id": {"type": "keyword"},
+                    "remoteci_id": {"type": "keyword"},
+                    "team_id": {"type": "keyword"},
+                    "files.junit_content": {"enabled": False},
+                }
+            },
+            version=_MAPPING_VERSION,
         )
-        if not jobs:
-            logger.info("no jobs to get from the api")
-            break
-        logger.info("got %s jobs from the api" % len(jobs))
-        for job in jobs:
-            logger.info("process job %s" % job["id"])
-            row = es.get("tasks_junit", job["id"])
-            if row:
-                continue
-            try:
-                _process_sync(api_conn, job)
-            except Exception as e:
-                logger.error(
-                    "error while processing job '%s': %s" % (job["id"], str(e))
-                )
-        offset += limit
+        _config = config.get_config()
+        self.api_conn = context.build_dci_context(
+            dci_login=_config["DCI_LOGIN"],
+            dci_password=_config["DCI_PASSWORD"],
+            dci_cs_url=_config["DCI_CS_URL"],
+        )
+
+    def process_jobs(self, jobs):
+        # the jobs already synchronized are skipped, checked once per page
+        existing_jobs = es.mget("tasks_junit", [j["id"] for j in jobs], source=False)
+        jobs = [j for j in jobs if j["id"] not in existing_jobs]
+        # and the junit files of the page are looked up at once
+        self.junit_files = junit_cache.get_many(
+            [
+                f
+                for j in jobs
+                for f in j["files"]
+                if f["state"] == "active" and f["mime"] == "application/junit"
+            ]
+        )
+        super(JunitSynchronizer, self).process_jobs(jobs)
+
+    def process(self, job):
+        _process_sync(self.api_conn, job, self.writer, self.junit_files)
+
 
-    session_db.close()
+def get_synchronizer(synchronization_type):
+    if synchronization_type == "full":
+        return JunitSynchronizer("weeks", 12)
+    return JunitSynchronizer("hours", 6, incremental=True)
 
 
 def partial(_lock_synchronization):
-    _sync("hours", 6)
+    engine.run([get_synchronizer("partial")])
     _lock_synchronization.release()
 
 
 def full(_lock_synchronization):
-    _sync("weeks", 12)
+    engine.run([get_synchronizer("full")])
     _lock_synchronization.release()
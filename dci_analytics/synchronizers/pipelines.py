@@ -16,17 +16,19 @@
 # under the License.
 
 
-from dci.analytics import access_data_layer as a_d_l
 from dci_analytics import elasticsearch as es
-from dci_analytics import dci_db
+from dci_analytics.synchronizers import engine
 
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+# to increment when the pipelines_status mapping changes
+_MAPPING_VERSION = 1
 
-def _process(job):
+
+def _process(job, writer):
     if job["pipeline_id"] is None:
         logger.info("not a pipeline job")
         return
@@ -36,58 +38,45 @@ def _process(job):
     job_name = job["name"]
     doc_id = f"{pipeline_id}-{job_name}"
 
-    doc = es.get("pipelines_status", doc_id)
-
     logger.info(f"push job {job_name} of pipeline {pipeline_name}")
+    writer.upsert("pipelines_status", job, doc_id)
+
+
+class PipelinesSynchronizer(engine.Synchronizer):
+    name = "pipelines"
+
+    def start(self):
+        es.init_index(
+            "pipelines_status",
+            json={
+                "properties": {
+                    "pipeline.name": {"type": "keyword"},
+                    "team_id": {"type": "keyword"},
+                    "components.type": {"type": "keyword"},
+                }
+            },
+            version=_MAPPING_VERSION,
+        )
+
+    def process(self, job):
+        if "jobstates" in job:
+            del job["jobstates"]
+        if "files" in job:
+            del job["files"]
+        _process(job, self.writer)
+
 
-    if doc:
-        es.update("pipelines_status", job, doc_id)
-    else:
-        es.push("pipelines_status", job, doc_id)
-
-
-def _sync(unit, amount):
-    es.init_index(
-        "pipelines_status",
-        json={
-            "properties": {
-                "pipeline.name": {"type": "keyword"},
-                "team_id": {"type": "keyword"},
-                "components.type": {"type": "keyword"},
-            }
-        },
-    )
-
-    session_db = dci_db.get_session_db()
-    limit = 100
-    offset = 0
-
-    while True:
-        jobs = a_d_l.get_jobs(session_db, offset, limit, unit=unit, amount=amount)
-        if not jobs:
-            break
-        for job in jobs:
-            logger.info("process job %s" % job["id"])
-            try:
-                if "jobstates" in job:
-                    del job["jobstates"]
-                if "files" in job:
-                    del job["files"]
-                _process(job)
-            except Exception as e:
-                logger.error(
-                    "error while processing job '%s': %s" % (job["id"], str(e))
-                )
-        offset += limit
-
-    session_db.close()
+def get_synchronizer(synchronization_type):
+    if synchronization_type == "full":
+        return PipelinesSynchronizer("weeks", 24)
+    return PipelinesSynchronizer("hours", 6, incremental=True)
 
 
 def partial(_lock_synchronization):
-    _sync("hours", 6)
+    engine.run([get_synchronizer("partial")])
     _lock_synchronization.release()
 
 
 def full(_lock_synchronization):
-    _sync("weeks", 24)
+    engine.run([get_synchronizer("full")])
     _lock_synchronization.release()
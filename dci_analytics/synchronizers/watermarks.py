@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime as dt
+from datetime import timedelta
+
+import logging
+
+from dci_analytics import config
+from dci_analytics import elasticsearch as es
+
+
+logger = logging.getLogger(__name__)
+
+_INDEX = "synchronization_watermarks"
+
+# the watermark only moves forward, even if several synchronizations race
+_ADVANCE_SCRIPT = """
+if (ctx._source.updated_at == null
+    || ctx._source.updated_at.compareTo(params.updated_at) < 0) {
+  ctx._source.updated_at = params.updated_at;
+} else {
+  ctx.op = 'noop';
+}
+"""
+
+
+def _parse_date(value):
+    for date_format in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return dt.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError("invalid watermark date '%s'" % value)
+
+
+def get(name):
+    doc = es.get(_INDEX, name)
+    if doc:
+        return doc["updated_at"]
+    return None
+
+
+def get_updated_since(name):
+    """Return the date from which the jobs must be synchronized, or None."""
+    watermark = get(name)
+    if watermark is None:
+        return None
+    overlap = timedelta(seconds=config.CONFIG["SYNC_WATERMARK_OVERLAP"])
+    return _parse_date(watermark) - overlap
+
+
+def advance(name, updated_at):
+    logger.info("%s: advance watermark to %s" % (name, updated_at))
+    return es.script_upsert(
+        _INDEX,
+        name,
+        _ADVANCE_SCRIPT,
+        params={"updated_at": updated_at},
+        upsert={"name": name, "updated_at": updated_at},
+    )
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import concurrent.futures
+import logging
+import time
+
+from kombu.mixins import ConsumerMixin
+
+from dci_analytics import config
+from dci_analytics import elasticsearch as es
+from dci_analytics.synchronizers import jobs
+
+
+logger = logging.getLogger(__name__)
+
+_INDEX = "jobs"
+
+
+def sync_batch(jobs_batch, executor):
+    latest_index_alias = es.get_latest_index_alias(_INDEX)
+    logger.info(f"latest_index_alias: {latest_index_alias}")
+    if latest_index_alias:
+        return jobs.sync_jobs(latest_index_alias, jobs_batch, executor)
+    new_index_name = es.generate_new_index_name(_INDEX)
+    logger.info(f"new index created: '{new_index_name}'")
+    failed = jobs.sync_jobs(new_index_name, jobs_batch, executor)
+    new_alias = es.add_alias_to_index(_INDEX, new_index_name)
+    logger.info(f"new alias '{new_alias}' added for index: '{new_index_name}'")
+    return failed
+
+
+class Worker(ConsumerMixin):
+    """Synchronize the jobs of the received job events in batches.
+
+    A batch is synchronized once it holds WORKER_BATCH_SIZE jobs or once its
+    first job waited WORKER_BATCH_INTERVAL seconds, the events of a job
+    received meanwhile are coalesced. The messages are acked once their
+    batch is written, the events of a job failing with a transient error are
+    requeued up to WORKER_MAX_REQUEUES times in a row, then rejected.
+    """
+
+    def __init__(self, connection, queues):
+        self.connection = connection
+        self.queues = queues
+        self.prefetch_count = config.CONFIG["WORKER_PREFETCH_COUNT"]
+        self.batch_size = config.CONFIG["WORKER_BATCH_SIZE"]
+        self.batch_interval = config.CONFIG["WORKER_BATCH_INTERVAL"]
+        self.max_requeues = config.CONFIG["WORKER_MAX_REQUEUES"]
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.CONFIG["WORKER_THREADS"]
+        )
+        # the batches are synchronized one after the other out of the
+        # consumer thread, which keeps receiving messages and heartbeats
+        self.batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # job id -> (newest job event, messages of the job events)
+        self.batch = {}
+        self.batch_started_at = None
+        self.pending_batches = []
+        # job id -> number of times the job events were requeued in a row
+        self.requeues = {}
+
+    def get_consumers(self, Consumer, channel):
+        return [
+            Consumer(
+                queues=self.queues,
+                callbacks=[self.on_message],
+                prefetch_count=self.prefetch_count,
+            )
+        ]
+
+    def on_message(self, body, message):
+        event = body["event"]
+        job_id = body["job"]["id"]
+        logger.info(f"Handle job event {event}: job_id {job_id}")
+
+        if not self.batch:
+            self.batch_started_at = time.monotonic()
+        if job_id in self.batch:
+            newest_body, messages = self.batch[job_id]
+            messages.append(message)
+            if body["job"]["updated_at"] > newest_body["job"]["updated_at"]:
+                self.batch[job_id] = (body, messages)
+            return
+        self.batch[job_id] = (body, [message])
+        if len(self.batch) >= self.batch_size:
+            self.submit_batch()
+
+    def submit_batch(self):
+        batch, self.batch = self.batch, {}
+        jobs_batch = [body["job"] for body, _ in batch.values()]
+        future = self.batch_executor.submit(sync_batch, jobs_batch, self.executor)
+        self.pending_batches.append((batch, future))
+
+    def on_iteration(self):
+        if (
+            self.batch
+            and time.monotonic() - self.batch_started_at >= self.batch_interval
+        ):
+            self.submit_batch()
+        self.ack_batches()
+
+    def ack_batches(self):
+        # the channel is not thread safe, the messages are acked by the
+        # consumer thread once their batch is written
+        while self.pending_batches and self.pending_batches[0][1].done():
+            batch, future = self.pending_batches.pop(0)
+            try:
+                to_retry = future.result()
+            except Exception as e:
+                logger.error(f"error while synchronizing a batch: {e}")
+                to_retry = set(batch)
+            for job_id, (_, messages) in batch.items():
+                if job_id in to_retry:
+                    requeue = self.count_requeue(job_id)
+                else:
+                    requeue = False
+                    self.requeues.pop(job_id, None)
+                for message in messages:
+                    try:
+                        if requeue:
+                            message.requeue()
+                        elif job_id in to_retry:
+                            message.reject(requeue=False)
+                        else:
+                            message.ack()
+                    except Exception as e:
+                        logger.error(f"error while acknowledging a message: {e}")
+
+    def count_requeue(self, job_id):
+        """Return whether the job events can be requeued once more."""
+        requeues = self.requeues.pop(job_id, 0) + 1
+        if requeues > self.max_requeues:
+            logger.error(f"job {job_id} dropped after {requeues - 1} requeues")
+            return False
+        self.requeues[job_id] = requeues
+        return True
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+
+from dci_analytics.app import app
+
+
+@mock.patch("dci_analytics.api.jobs.es")
+def test_get_jobs_meta(m_es):
+    m_es.get_latest_index_alias.return_value = "jobs-1"
+    m_es.search_json.return_value = {"hits": {"hits": [{"_id": "j1"}]}}
+    m_es.get_index_meta.return_value = {
+        "last_job_date": "2024-01-01T00:00:00",
+        "mapping_version": 2,
+    }
+    res = app.test_client().get("/jobs", json={"query": {}})
+    assert res.status_code == 200
+    assert res.json["_meta"] == {"last_job_date": "2024-01-01T00:00:00"}
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from dci_analytics.api import synchronization
+
+
+def test_fanout_lock_refused_while_a_synchronizer_runs():
+    jobs_lock = synchronization._LOCKS["jobs_full"]
+    fanout_lock = synchronization._LOCKS["fanout_full"]
+    assert jobs_lock.acquire(blocking=False)
+    try:
+        lock = synchronization._get_lock("fanout", "full")
+        assert not lock.acquire(blocking=False)
+        # the locks taken before the held one have been released
+        assert not fanout_lock.locked()
+        assert not synchronization._LOCKS["junit_full"].locked()
+        # the partial synchronizations are not concerned
+        lock = synchronization._get_lock("fanout", "partial")
+        assert lock.acquire(blocking=False)
+        lock.release()
+    finally:
+        jobs_lock.release()
+
+
+def test_fanout_lock_holds_the_synchronizers_locks():
+    lock = synchronization._get_lock("fanout", "partial")
+    assert lock.acquire(blocking=False)
+    try:
+        assert synchronization._LOCKS["jobs_partial"].locked()
+        assert not synchronization._get_lock("jobs", "partial").acquire(blocking=False)
+    finally:
+        lock.release()
+    assert not synchronization._LOCKS["fanout_partial"].locked()
+    assert not synchronization._LOCKS["jobs_partial"].locked()
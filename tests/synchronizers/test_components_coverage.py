@@ -15,60 +15,71 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import mock
+
 from dci_analytics.synchronizers import components_coverage
 
 
-def test_update_component_coverage():
+def test_get_component_coverage_update():
     job = {
         "status": "success",
         "id": "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e",
         "created_at": "2022-01-14T00:40:17.145315",
         "name": "job_name",
     }
-    c_c = {"success_jobs": [], "failed_jobs": []}
-    do_update, data = components_coverage.update_component_coverage(job, c_c)
-    assert do_update == True  # noqa
-    assert {j["id"] for j in data["success_jobs"]} == {
-        "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e"
+    assert components_coverage.get_component_coverage_update(job) == {
+        "field": "success_jobs",
+        "job": {
+            "id": "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e",
+            "created_at": "2022-01-14T00:40:17.145315",
+            "name": "job_name",
+        },
     }
 
+    job["status"] = "failure"
+    params = components_coverage.get_component_coverage_update(job)
+    assert params["field"] == "failed_jobs"
+
+
+def test_process():
     job = {
         "status": "failure",
-        "id": "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e",
+        "id": "job_id",
         "created_at": "2022-01-15T00:40:17.145315",
         "name": "job_name",
-    }
-    c_c = {
-        "success_jobs": [],
-        "failed_jobs": [
+        "team_id": "team_id",
+        "product_id": "product_id",
+        "components": [
             {
-                "id": "41d1fb0c-c0e0-4b8d-938e-25e0b0a2682f",
-                "created_at": "2022-01-15T00:40:17.145315",
+                "id": "c1",
+                "name": "c1",
+                "display_name": "c1",
+                "topic_id": "topic_id",
+                "tags": [],
+                "type": "ocp",
+                "created_at": "2022-01-01T00:00:00",
+                "released_at": "2022-01-01T00:00:00",
             }
         ],
     }
-    do_update, data = components_coverage.update_component_coverage(job, c_c)
-    assert do_update == True  # noqa
-    assert {j["id"] for j in data["failed_jobs"]} == {
-        "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e",
-        "41d1fb0c-c0e0-4b8d-938e-25e0b0a2682f",
-    }
-
-    job = {
-        "status": "success",
-        "id": "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e",
-        "created_at": "2022-01-15T00:40:17.145315",
-        "name": "job_name",
-    }
-    c_c = {
-        "success_jobs": [
-            {
-                "id": "31d1fb0c-c0e0-4b8d-938e-25e0b0a2682e",
+    writer = mock.Mock()
+    components = components_coverage.process(job, writer)
+    assert list(components) == ["c1"]
+    assert writer.script_upsert.call_count == 2
+    for call, team_id in zip(
+        writer.script_upsert.call_args_list, ("team_id", "red_hat")
+    ):
+        index, doc_id, script, params, upsert = call[0]
+        assert index == "tasks_components_coverage"
+        assert doc_id == "%s-c1" % team_id
+        assert params == {
+            "field": "failed_jobs",
+            "job": {
+                "id": "job_id",
                 "created_at": "2022-01-15T00:40:17.145315",
-            }
-        ],
-        "failed_jobs": [],
-    }
-    do_update, data = components_coverage.update_component_coverage(job, c_c)
-    assert do_update == False  # noqa
-    assert data == {}
+                "name": "job_name",
+            },
+        }
+        assert upsert["team_id"] == team_id
+        assert upsert["failed_jobs"] == [params["job"]]
+    assert not writer.get.called
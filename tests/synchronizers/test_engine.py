@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime
+
+import mock
+import pytest
+
+from dci_analytics.synchronizers import engine
+
+
+class RecordingSynchronizer(engine.Synchronizer):
+    def __init__(self, unit, amount, fail_on=None, incremental=False):
+        super(RecordingSynchronizer, self).__init__(
+            unit, amount, incremental=incremental
+        )
+        self.name = "recording"
+        self.fail_on = fail_on
+        self.processed = []
+        self.finished = False
+
+    def process(self, job):
+        if job["id"] == self.fail_on:
+            raise Exception("boom")
+        job["processed_by"] = self.name
+        self.processed.append(job["id"])
+
+    def finish(self):
+        self.finished = True
+
+
+def _job(job_id, status, created_at, updated_at=None):
+    return {
+        "id": job_id,
+        "status": status,
+        "created_at": created_at,
+        "updated_at": updated_at or created_at,
+    }
+
+
+@mock.patch("dci_analytics.synchronizers.engine.dt")
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.advance")
+@mock.patch("dci_analytics.synchronizers.engine.dci_db.get_session_db")
+@mock.patch("dci_analytics.synchronizers.engine.jobs_scanner.iter_jobs")
+def test_run_scans_the_jobs_once(m_iter_jobs, m_get_session_db, m_advance, m_dt):
+    m_dt.utcnow.return_value = datetime(2100, 1, 2)
+    jobs = [
+        _job("1", "success", "2100-01-01T00:00:00"),
+        _job("2", "failure", "2100-01-01T00:00:00"),
+        _job("3", "success", "2000-01-01T00:00:00"),
+    ]
+    m_iter_jobs.return_value = iter([jobs])
+    s_all = RecordingSynchronizer("weeks", 52, fail_on="2")
+    s_success = RecordingSynchronizer("weeks", 12)
+    s_success.status = "success"
+    s_success.name = "success"
+
+    engine.run([s_all, s_success])
+
+    m_iter_jobs.assert_called_once_with(
+        m_get_session_db.return_value,
+        "weeks",
+        52,
+        limit=100,
+        status=None,
+        updated_since=None,
+    )
+    assert s_all.processed == ["1", "3"]
+    # the job 3 is out of the 12 weeks time frame
+    assert s_success.processed == ["1"]
+    assert s_all.finished and s_success.finished
+    # each synchronizer works on its own copy of the jobs
+    assert "processed_by" not in jobs[0]
+    # the job 2 failed, the watermark of s_all is not advanced
+    m_advance.assert_called_once_with("success", "2100-01-01T00:00:00")
+
+
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.advance")
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.get_updated_since")
+@mock.patch("dci_analytics.synchronizers.engine.dci_db.get_session_db")
+@mock.patch("dci_analytics.synchronizers.engine.jobs_scanner.iter_jobs")
+def test_run_incremental(m_iter_jobs, m_get_session_db, m_get_updated_since, m_advance):
+    m_get_updated_since.return_value = datetime(2024, 1, 1, 12, 0, 0)
+    m_iter_jobs.return_value = iter(
+        [
+            [
+                _job("1", "success", "2023-01-01T00:00:00", "2024-01-01T11:00:00"),
+                _job("2", "success", "2023-01-01T00:00:00", "2024-01-01T13:00:00"),
+            ]
+        ]
+    )
+    s = RecordingSynchronizer("hours", 6, incremental=True)
+
+    engine.run([s])
+
+    assert m_iter_jobs.call_args[1]["updated_since"] == datetime(2024, 1, 1, 12)
+    assert s.processed == ["2"]
+    m_advance.assert_called_once_with("recording", "2024-01-01T13:00:00")
+
+
+@mock.patch("dci_analytics.synchronizers.engine.dt")
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.advance")
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.get_updated_since")
+@mock.patch("dci_analytics.synchronizers.engine.dci_db.get_session_db")
+@mock.patch("dci_analytics.synchronizers.engine.jobs_scanner.iter_jobs")
+def test_run_incremental_watermark_does_not_pass_the_scan_start(
+    m_iter_jobs, m_get_session_db, m_get_updated_since, m_advance, m_dt
+):
+    m_dt.utcnow.return_value = datetime(2024, 1, 1, 14, 0, 0)
+    m_get_updated_since.return_value = datetime(2024, 1, 1, 12, 0, 0)
+    # the job 1 is updated again at 14:10, after its page has been read,
+    # and the job 2 of the next page at 14:30
+    m_iter_jobs.return_value = iter(
+        [
+            [_job("1", "success", "2023-01-01T00:00:00", "2024-01-01T13:00:00")],
+            [_job("2", "success", "2023-01-02T00:00:00", "2024-01-01T14:30:00")],
+        ]
+    )
+    s = RecordingSynchronizer("hours", 6, incremental=True)
+
+    engine.run([s])
+
+    assert s.processed == ["1", "2"]
+    # the next synchronization still gets the 14:10 update of the job 1
+    m_advance.assert_called_once_with("recording", "2024-01-01T14:00:00")
+
+
+class FailingPageSynchronizer(RecordingSynchronizer):
+    def process_jobs(self, jobs):
+        raise Exception("elasticsearch error")
+
+
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.advance")
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.get_updated_since")
+@mock.patch("dci_analytics.synchronizers.engine.dci_db.get_session_db")
+@mock.patch("dci_analytics.synchronizers.engine.jobs_scanner.iter_jobs")
+def test_run_incremental_page_failure(
+    m_iter_jobs, m_get_session_db, m_get_updated_since, m_advance
+):
+    m_get_updated_since.return_value = datetime(2024, 1, 1)
+    m_iter_jobs.return_value = iter(
+        [[_job("1", "success", "2023-01-01T00:00:00", "2024-01-01T05:00:00")]]
+    )
+    s = FailingPageSynchronizer("hours", 6, incremental=True)
+
+    engine.run([s])
+
+    assert s.errors == 1
+    assert not m_advance.called
+
+
+@pytest.mark.parametrize(
+    "error,advanced",
+    [
+        ({"index": "jobs-1", "id": "1", "status": 400, "error": {}}, True),
+        ({"index": "junit_files_cache", "id": "md5", "status": 503}, True),
+        ({"index": "jobs-1", "id": "1", "status": 429, "error": {}}, False),
+        ({"status": None, "error": "connection error", "actions": 1}, False),
+    ],
+)
+@mock.patch("dci_analytics.synchronizers.engine.watermarks.advance")
+def test_advance_watermarks_writer_errors(m_advance, error, advanced):
+    s = RecordingSynchronizer("hours", 6, incremental=True)
+    s.max_updated_at = "2024-01-01T05:00:00"
+    s.writer.errors = [error]
+
+    engine._advance_watermarks([s], "2024-01-01T06:00:00")
+
+    assert m_advance.called == advanced
+
+
+def test_prefetch():
+    assert list(engine._prefetch(iter([[1], [2], [3]]), 2)) == [[1], [2], [3]]
+    assert list(engine._prefetch(iter([[1], [2]]), 0)) == [[1], [2]]
+
+    def _failing_pages():
+        yield [1]
+        raise Exception("database error")
+
+    pages = engine._prefetch(_failing_pages(), 1)
+    assert next(pages) == [1]
+    with pytest.raises(Exception):
+        next(pages)
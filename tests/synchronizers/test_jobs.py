@@ -15,23 +15,201 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import concurrent.futures
+import io
+import multiprocessing.pool
 import mock
+import threading
 
+from dci_analytics import elasticsearch as es
 from dci_analytics.synchronizers import jobs
 
 
-@mock.patch("dci_analytics.synchronizers.jobs.get_tests_from_cache")
-@mock.patch("dci_analytics.synchronizers.jobs.get_tests_from_api")
-@mock.patch("dci_analytics.synchronizers.jobs.es.push")
-def test_get_tests(m_es_push, m_gtfa, m_gtfc):
-    m_gtfc.return_value = []
-    m_gtfa.return_value = ["tests"]
-    job = {"id": "id", "created_at": "created_at", "files": []}
-    tests = jobs.get_tests(job=job, api_conn={})
-    m_es_push.assert_called_once_with(
-        jobs._INDEX_JUNIT_CACHE, {"created_at": "created_at", "tests": ["tests"]}, "id"
+@mock.patch("dci_analytics.synchronizers.jobs.read_file")
+def test_read_files(m_read_file):
+    def _read_file(api_conn, f, parser_pool=None, writer=None, junit_files=None):
+        if f["id"] == "f3":
+            raise Exception("download error")
+        return f["id"]
+
+    m_read_file.side_effect = _read_file
+    files = [
+        {"id": "f1", "state": "active", "mime": "application/junit"},
+        {"id": "f2", "state": "deleted", "mime": "application/junit"},
+        {"id": "f3", "state": "active", "mime": "application/junit"},
+        {"id": "f4", "state": "active", "mime": "text/plain"},
+        {"id": "f5", "state": "active", "mime": "application/dci-analytics+json"},
+    ]
+    files_read = jobs.read_files(
+        {}, files, ["application/junit", "application/dci-analytics+json"]
+    )
+    assert files_read == [(files[0], "f1"), (files[2], None), (files[4], "f5")]
+    assert m_read_file.call_count == 3
+
+
+@mock.patch("dci_analytics.synchronizers.jobs.junit_cache.get_or_parse")
+@mock.patch("dci_analytics.synchronizers.jobs.dci_files.open_file")
+def test_read_files_with_parser_pool(m_open_file, m_get_or_parse):
+    content = b'<testsuite name="s"><testcase name="t" time="1"/></testsuite>'
+    m_open_file.return_value = io.BytesIO(content)
+    m_get_or_parse.side_effect = lambda f, parse, writer, cached: parse(f)
+    files = [
+        {"id": "f1", "name": "f1.xml", "state": "active", "mime": "application/junit"}
+    ]
+    pool = multiprocessing.pool.ThreadPool(1)
+    parser_pool = mock.Mock(wraps=pool)
+    files_read = jobs.read_files({}, files, ["application/junit"], parser_pool)
+    pool.close()
+    pool.join()
+
+    # the file is downloaded by the thread and parsed in the pool
+    parser_pool.apply_async.assert_called_once_with(
+        jobs.junit_parser.parse_junit_content,
+        (content, "f1.xml", jobs.junit_parser.get_backend_name()),
+    )
+    [(f, testsuites)] = files_read
+    assert f == files[0]
+    assert [t["name"] for t in testsuites] == ["s"]
+    assert testsuites[0]["tests"] == 1
+
+
+@mock.patch("dci_analytics.synchronizers.jobs.junit_cache.get_many")
+@mock.patch("dci_analytics.synchronizers.jobs.es")
+@mock.patch("dci_analytics.synchronizers.jobs.process")
+@mock.patch("dci_analytics.synchronizers.jobs._get_api_connection")
+@mock.patch("dci_analytics.synchronizers.jobs.update_index")
+def test_sync_jobs_skips_stale_jobs(m_update_index, m_gac, m_process, m_es, m_get_many):
+    m_update_index.return_value = False
+    m_es.mget.return_value = {
+        "j1": {"updated_at": "2024-01-02T00:00:00"},
+        "j2": {"updated_at": "2024-01-01T00:00:00"},
+    }
+    m_es.BulkWriter.return_value.errors = []
+    junit_file = {"id": "f1", "state": "active", "mime": "application/junit"}
+    m_get_many.return_value = {"md5": {"testsuites": [], "junit_content": {}}}
+    j1 = {
+        "id": "j1",
+        "created_at": "2024",
+        "updated_at": "2024-01-01T00:00:00",
+        "files": [],
+    }
+    j2 = {
+        "id": "j2",
+        "created_at": "2024",
+        "updated_at": "2024-01-03T00:00:00",
+        "files": [junit_file],
+    }
+
+    assert jobs.sync_jobs("jobs-index", [j1, j2]) == set()
+    m_es.mget.assert_called_once_with(
+        "jobs-index", ["j1", "j2"], source_includes=["updated_at"]
+    )
+    m_get_many.assert_called_once_with([junit_file])
+    m_process.assert_called_once_with(
+        "jobs-index",
+        j2,
+        m_gac.return_value,
+        m_es.BulkWriter.return_value,
+        junit_files=m_get_many.return_value,
+    )
+    m_es.update_index_meta.assert_called_once_with(
+        "jobs-index", last_job_date="2024-01-03T00:00:00"
+    )
+
+
+@mock.patch("dci_analytics.synchronizers.jobs.junit_cache.get_many")
+@mock.patch("dci_analytics.synchronizers.jobs.es")
+@mock.patch("dci_analytics.synchronizers.jobs.process")
+@mock.patch("dci_analytics.synchronizers.jobs._get_api_connection")
+@mock.patch("dci_analytics.synchronizers.jobs.update_index")
+def test_sync_jobs_only_retries_transient_errors(
+    m_update_index, m_gac, m_process, m_es, m_get_many
+):
+    m_update_index.return_value = True
+    m_es.is_transient_error.side_effect = es.is_transient_error
+    m_process.side_effect = lambda index, job, *args, **kwargs: job
+    m_es.BulkWriter.return_value.errors = [
+        {"index": "jobs-index", "id": "j1", "status": 400, "error": {}},
+        {"index": "jobs-index", "id": "j2", "status": 429, "error": {}},
+        {"index": "jobs-index", "id": "j3", "status": 503, "error": {}},
+        {"index": "junit_files_cache", "id": "md5", "status": 503, "error": {}},
+    ]
+    jobs_batch = [
+        {"id": job_id, "created_at": "2024", "updated_at": "2024", "files": []}
+        for job_id in ("j1", "j2", "j3", "j4")
+    ]
+
+    assert jobs.sync_jobs("jobs-index", jobs_batch) == {"j2", "j3"}
+    m_es.update_index_meta.assert_called_once_with(
+        "jobs-index", last_job_date="2024", first_job_date="2024"
     )
-    assert tests == ["tests"]
+
+
+def _jobs_synchronizer(max_in_flight):
+    s = jobs.JobsSynchronizer("hours", 6, "jobs-index")
+    s.is_index_created = False
+    s.api_conn = None
+    s.parser_pool = None
+    s.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    s.in_flight = threading.BoundedSemaphore(max_in_flight)
+    return s
+
+
+@mock.patch("dci_analytics.synchronizers.jobs.es.update_index_meta")
+@mock.patch("dci_analytics.synchronizers.jobs.junit_cache.get_many")
+@mock.patch("dci_analytics.synchronizers.jobs.process")
+def test_jobs_synchronizer_counts_failed_jobs(m_process, m_get_many, m_uim):
+    m_get_many.return_value = {}
+    m_process.side_effect = Exception("download error")
+    s = _jobs_synchronizer(max_in_flight=1)
+
+    # the second job waits for the slot of the failed one
+    feeder = threading.Thread(
+        target=s.process_jobs,
+        args=(
+            [
+                {"id": "1", "files": [], "updated_at": "2024"},
+                {"id": "2", "files": [], "updated_at": "2024"},
+            ],
+        ),
+    )
+    feeder.start()
+    feeder.join(5)
+    assert not feeder.is_alive()
+    s.finish()
+
+    assert m_process.call_count == 2
+    assert s.errors == 2
+    assert s.in_flight.acquire(blocking=False)
+
+
+@mock.patch("dci_analytics.synchronizers.jobs.es.update_index_meta")
+@mock.patch("dci_analytics.synchronizers.jobs.junit_cache.get_many")
+@mock.patch("dci_analytics.synchronizers.jobs.process")
+def test_jobs_synchronizer_finish_waits_for_jobs(m_process, m_get_many, m_uim):
+    m_get_many.return_value = {}
+    processing = threading.Event()
+    done = threading.Event()
+
+    def _process(*args, **kwargs):
+        processing.set()
+        done.wait(5)
+
+    m_process.side_effect = _process
+    s = _jobs_synchronizer(max_in_flight=2)
+    s.process_jobs([{"id": "1", "files": [], "updated_at": "2024"}])
+    assert processing.wait(5)
+
+    finisher = threading.Thread(target=s.finish)
+    finisher.start()
+    finisher.join(0.1)
+    assert finisher.is_alive()
+    assert not m_uim.called
+    done.set()
+    finisher.join(5)
+    assert not finisher.is_alive()
+    m_uim.assert_called_once_with("jobs-index", last_job_date="2024")
+    assert s.errors == 0
 
 
 def test_clean_doted_keys():
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from dci_analytics import dci_db
+
+
+def test_get_session_db_shares_the_engine():
+    session_1 = dci_db.get_session_db()
+    session_2 = dci_db.get_session_db()
+    assert session_1 is not session_2
+    assert session_1.get_bind() is session_2.get_bind() is dci_db.get_engine()
+    stats = dci_db.get_pool_stats()
+    assert stats["checked_out"] == 0
+    session_1.close()
+    session_2.close()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+
+import mock
+import pytest
+
+from xml.etree import ElementTree
+
+from dci_analytics import dci_files
+
+
+def _api_conn(content, headers=None):
+    api_conn = mock.Mock()
+    r = api_conn.session.get.return_value
+    r.raw = io.BytesIO(content)
+    r.headers = headers or {}
+    return api_conn
+
+
+def test_open_file_streams_the_content():
+    content = b"<testsuites><testsuite name='ts'/></testsuites>"
+    api_conn = _api_conn(content)
+    with dci_files.open_file(api_conn, "f1", max_size=1024) as f:
+        tags = [e.tag for _, e in ElementTree.iterparse(f)]
+    assert tags == ["testsuite", "testsuites"]
+    url = api_conn.session.get.call_args[0][0]
+    assert url.endswith("/api/v2/files/f1/content")
+    assert api_conn.session.get.call_args[1]["stream"] is True
+    api_conn.session.get.return_value.close.assert_called_once_with()
+
+
+def test_open_file_max_size():
+    api_conn = _api_conn(b"x" * 100)
+    with pytest.raises(dci_files.FileTooLarge):
+        with dci_files.open_file(api_conn, "f1", max_size=10) as f:
+            f.read(8)
+            f.read(8)
+    with dci_files.open_file(api_conn, "f1", max_size=None) as f:
+        f.read()
+
+    api_conn = _api_conn(b"", headers={"Content-Length": "100"})
+    with pytest.raises(dci_files.FileTooLarge):
+        with dci_files.open_file(api_conn, "f1", max_size=10):
+            pass
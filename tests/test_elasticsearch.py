@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import mock
+import threading
+
+from dci_analytics import elasticsearch as es
+
+
+def test_get_session_is_shared():
+    assert es.get_session() is es.get_session()
+
+
+@mock.patch("dci_analytics.elasticsearch.get_session")
+def test_request_uses_shared_session_with_timeout(m_get_session):
+    es._request("get", "http://es/index")
+    m_get_session.return_value.request.assert_called_once_with(
+        "get",
+        "http://es/index",
+        timeout=(
+            es.config.CONFIG["ELASTICSEARCH_CONNECT_TIMEOUT"],
+            es.config.CONFIG["ELASTICSEARCH_READ_TIMEOUT"],
+        ),
+    )
+
+
+def test_get_pool_stats():
+    es.get_session()
+    stats = es.get_pool_stats()
+    assert stats["pool_maxsize"] == es.config.CONFIG["ELASTICSEARCH_POOL_MAXSIZE"]
+    assert "requests" in stats
+    assert stats["pools"] == []
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_bulk_writer_flush_by_docs(m_request):
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {"errors": False, "items": []}
+    writer = es.BulkWriter(max_docs=2, flush_interval=60)
+    writer.create("index", {"a": 1}, "id1")
+    assert not m_request.called
+    writer.update("index", {"a": 2}, "id2")
+    m_request.assert_called_once()
+    body = m_request.call_args[1]["data"].decode("utf-8").splitlines()
+    assert body == [
+        '{"create": {"_index": "index", "_id": "id1"}}',
+        '{"a": 1}',
+        '{"update": {"_index": "index", "_id": "id2"}}',
+        '{"doc": {"a": 2}}',
+    ]
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_bulk_writer_on_sent(m_request):
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {"errors": False, "items": []}
+    on_sent = mock.Mock()
+    writer = es.BulkWriter(max_docs=2, flush_interval=60)
+    writer.index("index", {"a": 1}, "id1", on_sent=on_sent)
+    assert not on_sent.called
+    writer.flush()
+    on_sent.assert_called_once_with()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_bulk_writer_sends_out_of_the_lock(m_request):
+    sending = threading.Event()
+    release = threading.Event()
+    semaphore = threading.BoundedSemaphore(1)
+
+    def _request(*args, **kwargs):
+        # the request is sent while holding the semaphore
+        assert not semaphore.acquire(blocking=False)
+        sending.set()
+        release.wait(5)
+        return mock.Mock(status_code=200, json=lambda: {"errors": False})
+
+    m_request.side_effect = _request
+    writer = es.BulkWriter(max_docs=100, flush_interval=60, send_semaphore=semaphore)
+    writer.create("index", {"a": 1}, "id1")
+    flusher = threading.Thread(target=writer.flush)
+    flusher.start()
+    assert sending.wait(5)
+    # the other threads keep buffering while the request is in flight
+    writer.create("index", {"a": 2}, "id2")
+    release.set()
+    flusher.join(5)
+    assert not flusher.is_alive()
+    writer.flush()
+    assert writer.stats["flushes"] == 2
+    assert writer.stats["actions"] == 2
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_bulk_writer_script_upsert(m_request):
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {"errors": False, "items": []}
+    with es.BulkWriter(flush_interval=60) as writer:
+        writer.script_upsert("index", "id1", "script", {"p": 1}, {"a": 1})
+    body = m_request.call_args[1]["data"].decode("utf-8").splitlines()
+    assert json.loads(body[0]) == {"update": {"_index": "index", "_id": "id1"}}
+    assert json.loads(body[1]) == {
+        "script": {"source": "script", "lang": "painless", "params": {"p": 1}},
+        "upsert": {"a": 1},
+    }
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_bulk_writer_reports_item_failures(m_request):
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {
+        "errors": True,
+        "items": [
+            {"create": {"_index": "index", "_id": "id1", "status": 201}},
+            {
+                "create": {
+                    "_index": "index",
+                    "_id": "id2",
+                    "status": 409,
+                    "error": {"type": "version_conflict_engine_exception"},
+                }
+            },
+            {
+                "index": {
+                    "_index": "index",
+                    "_id": "id3",
+                    "status": 400,
+                    "error": {"type": "mapper_parsing_exception"},
+                }
+            },
+        ],
+    }
+    with es.BulkWriter(flush_interval=60) as writer:
+        writer.create("index", {}, "id1")
+        writer.create("index", {}, "id2")
+        writer.index("index", {}, "id3")
+    assert [e["id"] for e in writer.errors] == ["id3"]
+    assert writer.stats["actions"] == 3
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_upsert(m_request):
+    m_request.return_value.status_code = 200
+    es.upsert("index", {"a": 1}, "id1")
+    m_request.assert_called_once_with(
+        "post",
+        "%s/index/_update/id1" % es._ES_URL,
+        json={"doc": {"a": 1}, "doc_as_upsert": True},
+    )
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_get_latest_index_alias_is_cached(m_request):
+    es.invalidate_alias_cache()
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = [
+        {"alias": "jobs-2024-01-02T00-00-00"},
+        {"alias": "jobs-2024-01-01T00-00-00"},
+    ]
+    assert es.get_latest_index_alias("jobs") == "jobs-2024-01-02T00-00-00"
+    assert es.get_latest_index_alias("jobs") == "jobs-2024-01-02T00-00-00"
+    m_request.assert_called_once_with(
+        "get",
+        "%s/_cat/aliases/jobs-*" % es._ES_URL,
+        params={"format": "json", "h": "alias"},
+    )
+
+    es.add_alias_to_index("jobs", "jobs-1")
+    es.get_latest_index_alias("jobs")
+    assert m_request.call_count == 3
+    es.invalidate_alias_cache()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_get_index_meta_is_cached(m_request):
+    es.invalidate_index_meta_cache()
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {
+        "jobs-1": {"mappings": {"_meta": {"last_sync_date": "2024-01-01"}}}
+    }
+    assert es.get_index_meta("jobs-alias") == {"last_sync_date": "2024-01-01"}
+    assert es.get_index_meta("jobs-alias") == {"last_sync_date": "2024-01-01"}
+    m_request.assert_called_once_with(
+        "get",
+        "%s/jobs-alias/_mapping" % es._ES_URL,
+        params={"filter_path": "*.mappings._meta"},
+    )
+
+    es.update_index_meta("jobs-alias", last_job_date="2024-01-02")
+    assert es.get_index_meta("jobs-alias") == {"last_sync_date": "2024-01-02"}
+    # one GET to refresh the meta before writing it and one PUT
+    assert m_request.call_count == 3
+    es.invalidate_index_meta_cache()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_get_index_meta_without_meta(m_request):
+    es.invalidate_index_meta_cache()
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {}
+    assert es.get_index_meta("index") == {}
+    es.invalidate_index_meta_cache()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_search_iter(m_request):
+    pit = mock.Mock(status_code=200)
+    pit.json.return_value = {"id": "pit-1"}
+    page_1 = mock.Mock(status_code=200)
+    page_1.json.return_value = {
+        "pit_id": "pit-2",
+        "hits": {"hits": [{"_id": "1", "sort": [1]}, {"_id": "2", "sort": [2]}]},
+    }
+    page_2 = mock.Mock(status_code=200)
+    page_2.json.return_value = {
+        "pit_id": "pit-2",
+        "hits": {"hits": [{"_id": "3", "sort": [3]}]},
+    }
+    close = mock.Mock(status_code=200)
+    m_request.side_effect = [pit, page_1, page_2, close]
+
+    body = {"query": {"match_all": {}}, "from": 0, "sort": ["created_at"]}
+    hits = list(es.search_iter("index", body, page_size=2))
+
+    assert [h["_id"] for h in hits] == ["1", "2", "3"]
+    last_search = m_request.call_args_list[2][1]["json"]
+    assert "from" not in last_search
+    assert last_search["search_after"] == [2]
+    assert last_search["pit"]["id"] == "pit-2"
+    m_request.assert_called_with("delete", "%s/_pit" % es._ES_URL, json={"id": "pit-2"})
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_search_json_source_filter(m_request):
+    body = {"query": {"match_all": {}}}
+    es.search_json("index", body, source_excludes=["files"])
+    m_request.assert_called_once_with(
+        "get",
+        "%s/index/_search" % es._ES_URL,
+        json={"query": {"match_all": {}}, "_source": {"excludes": ["files"]}},
+    )
+    assert "_source" not in body
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_delete_old_indices(m_request):
+    aliases = mock.Mock(status_code=200)
+    aliases.json.return_value = [
+        {"index": "jobs-1700000100.5"},
+        {"index": "jobs-1700000200.5"},
+        {"index": "jobs-1700000400.5"},
+    ]
+    indices = mock.Mock(status_code=200)
+    indices.json.return_value = [
+        {"index": "jobs-1700000500.5"},
+        {"index": "jobs-1700000300.5"},
+        {"index": "jobs-1700000100.5"},
+        {"index": "jobs-not-a-timestamp"},
+        {"index": "jobs-1700000400.5"},
+        {"index": "jobs-1700000200.5"},
+    ]
+    m_request.side_effect = [aliases, indices] + [mock.Mock(status_code=200)] * 2
+    deleted_indices = es.delete_old_indices("jobs", 2)
+    # the unaliased index of a failed synchronization is deleted but not
+    # the newer one, which may still be loading
+    assert deleted_indices == ["jobs-1700000100.5", "jobs-1700000300.5"]
+    m_request.assert_called_with("delete", "%s/jobs-1700000300.5" % es._ES_URL)
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_init_index_is_registered(m_request):
+    es.invalidate_index_registry()
+    m_request.return_value.status_code = 404
+    es.init_index("index", json={"properties": {}}, version=1)
+    m_request.assert_any_call(
+        "put",
+        "%s/index/_mapping" % es._ES_URL,
+        json={"properties": {}, "_meta": {"mapping_version": 1}},
+    )
+    assert m_request.call_count == 3
+    es.init_index("index", json={"properties": {}}, version=1)
+    assert m_request.call_count == 3
+    es.invalidate_index_registry()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_update_index_upgrades_the_mapping_once(m_request):
+    es.invalidate_index_registry()
+    es.invalidate_index_meta_cache()
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {
+        "jobs-1": {"mappings": {"_meta": {"mapping_version": 1, "last_sync_date": "d"}}}
+    }
+    json = {"mappings": {"properties": {"a": {"type": "keyword"}}}, "settings": {}}
+    assert es.update_index("jobs-1", json, version=2) is False
+    m_request.assert_called_with(
+        "put",
+        "%s/jobs-1/_mapping" % es._ES_URL,
+        json={
+            "properties": {"a": {"type": "keyword"}},
+            "_meta": {"mapping_version": 2, "last_sync_date": "d"},
+        },
+    )
+    assert m_request.call_count == 3
+    assert es.update_index("jobs-1", json, version=2) is False
+    assert m_request.call_count == 3
+    es.invalidate_index_registry()
+    es.invalidate_index_meta_cache()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_update_index_keeps_the_meta_it_cannot_read(m_request):
+    es.invalidate_index_registry()
+    es.invalidate_index_meta_cache()
+    index = mock.Mock(status_code=200)
+    meta = mock.Mock(status_code=503, text="unavailable")
+    m_request.side_effect = [index, meta, index, meta, meta]
+    json = {"mappings": {"properties": {}}, "settings": {}}
+    assert es.update_index("jobs-1", json, version=2) is False
+    # no mapping PUT erasing the meta, and the index is checked again
+    assert [c[0][0] for c in m_request.call_args_list] == ["get", "get"]
+    assert es.update_index("jobs-1", json, version=2) is False
+    assert m_request.call_count == 4
+    es.update_index_meta("jobs-1", last_job_date="2024-01-02")
+    assert m_request.call_count == 5
+    es.invalidate_index_registry()
+    es.invalidate_index_meta_cache()
+
+
+@mock.patch("dci_analytics.elasticsearch._request")
+def test_mget(m_request):
+    m_request.return_value.status_code = 200
+    m_request.return_value.json.return_value = {
+        "docs": [
+            {"_id": "1", "found": True, "_source": {"tests": []}},
+            {"_id": "2", "found": False},
+        ]
+    }
+    assert es.mget("index", ["1", "2"], source_includes=["tests"]) == {
+        "1": {"tests": []}
+    }
+    m_request.assert_called_once_with(
+        "post",
+        "%s/index/_mget" % es._ES_URL,
+        json={"ids": ["1", "2"]},
+        params={"_source_includes": "tests"},
+    )
+
+    m_request.return_value.json.return_value = {
+        "docs": [{"_id": "1", "found": True}, {"_id": "2", "found": False}]
+    }
+    assert es.mget("index", ["1", "2"], source=False) == {"1": {}}
+    assert m_request.call_args[1]["params"] == {"_source": "false"}
+    assert es.mget("index", []) == {}
+    assert m_request.call_count == 2
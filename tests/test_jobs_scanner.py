@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime, timedelta
+
+import mock
+import pytest
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.declarative import declarative_base
+
+from dci_analytics import jobs_scanner
+
+Base = declarative_base()
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+    created_at = sqlalchemy.Column(sqlalchemy.DateTime)
+    updated_at = sqlalchemy.Column(sqlalchemy.DateTime)
+    status = sqlalchemy.Column(sqlalchemy.String)
+    state = sqlalchemy.Column(sqlalchemy.String)
+
+    def serialize(self, ignore_columns=None):
+        return {"id": self.id}
+
+
+@pytest.fixture
+def session_db():
+    engine = sqlalchemy.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sqlalchemy.orm.sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    jobs = [
+        # the jobs 1, 2 and 3 share their creation date
+        ("3", now - timedelta(hours=3), now, "success", "active"),
+        ("1", now - timedelta(hours=3), now, "failure", "active"),
+        ("2", now - timedelta(hours=3), now - timedelta(days=2), "success", "active"),
+        ("4", now - timedelta(hours=2), now, "success", "archived"),
+        ("5", now - timedelta(hours=1), now, "success", "active"),
+        ("6", now - timedelta(days=30), now, "success", "active"),
+    ]
+    for job_id, created_at, updated_at, status, state in jobs:
+        session.add(
+            Job(
+                id=job_id,
+                created_at=created_at,
+                updated_at=updated_at,
+                status=status,
+                state=state,
+            )
+        )
+    session.commit()
+    with mock.patch("dci_analytics.jobs_scanner.models2") as m_models2:
+        m_models2.Job = Job
+        # the test model has no relationship to load
+        with mock.patch(
+            "dci_analytics.jobs_scanner._with_relationships", side_effect=lambda q: q
+        ):
+            yield session
+    session.close()
+
+
+def _ids(pages):
+    return [[job["id"] for job in page] for page in pages]
+
+
+def test_get_jobs_after_query(session_db):
+    queries = []
+
+    def _with_relationships(query):
+        queries.append(query)
+        return query
+
+    cursor = (datetime(2024, 1, 1), "1")
+    with mock.patch(
+        "dci_analytics.jobs_scanner._with_relationships",
+        side_effect=_with_relationships,
+    ):
+        jobs_scanner.get_jobs_after(session_db, cursor, 2, "days", 1)
+    statement = str(queries[0].statement.compile(dialect=postgresql.dialect()))
+    assert "(jobs.created_at, jobs.id) > (%(param_1)s, %(param_2)s)" in statement
+    assert "jobs.state != %(state_1)s" in statement
+    assert statement.endswith("ORDER BY jobs.created_at ASC, jobs.id ASC")
+
+
+def test_get_jobs_after(session_db):
+    jobs, cursor = jobs_scanner.get_jobs_after(session_db, None, 2, "days", 1)
+    assert [j["id"] for j in jobs] == ["1", "2"]
+    jobs, cursor = jobs_scanner.get_jobs_after(session_db, cursor, 2, "days", 1)
+    # the cursor goes on with the jobs created at the same date
+    assert [j["id"] for j in jobs] == ["3", "5"]
+    jobs, last_cursor = jobs_scanner.get_jobs_after(session_db, cursor, 2, "days", 1)
+    assert jobs == []
+    assert last_cursor == cursor
+
+
+def test_iter_jobs(session_db):
+    pages = jobs_scanner.iter_jobs(session_db, "days", 1, limit=2)
+    # the archived job 4 and the job 6 out of the time frame are skipped
+    assert _ids(pages) == [["1", "2"], ["3", "5"]]
+
+    pages = jobs_scanner.iter_jobs(session_db, "days", 1, limit=2, status="success")
+    assert _ids(pages) == [["2", "3"], ["5"]]
+
+
+def test_iter_jobs_updated_since(session_db):
+    updated_since = datetime.utcnow() - timedelta(days=1)
+    pages = jobs_scanner.iter_jobs(
+        session_db, "hours", 1, limit=10, updated_since=updated_since
+    )
+    # the creation time frame is ignored, the job 2 is not updated since
+    assert _ids(pages) == [["6", "1", "3", "5"]]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+import mock
+
+from dci_analytics import config
+from dci_analytics import junit_cache
+
+_FILE = {"id": "f1", "md5": "md5", "name": "junit.xml", "created_at": "2024"}
+_PARSED = {"testsuites": [], "junit_content": {"c/t": 1.0}}
+
+
+def test_get_key():
+    assert junit_cache.get_key(_FILE) == "md5"
+    assert junit_cache.get_key({"id": "f1", "md5": None}) == "f1"
+
+
+@mock.patch("dci_analytics.junit_cache.es")
+def test_get_many(m_es):
+    m_es.mget.return_value = {"md5": dict(md5="md5", created_at="2024", **_PARSED)}
+    other_file = {"id": "f2", "md5": "md5", "name": "junit.xml"}
+    assert junit_cache.get_many([_FILE, other_file, {"id": "f3"}]) == {"md5": _PARSED}
+    # the files sharing a content are looked up once
+    m_es.mget.assert_called_once_with(
+        junit_cache._INDEX,
+        ["md5", "f3"],
+        source_includes=["testsuites", "junit_content"],
+    )
+
+
+def test_get_or_parse():
+    stats = junit_cache.get_stats()
+    writer = mock.Mock()
+    parse = mock.Mock(return_value=_PARSED)
+    f = dict(_FILE, md5="md5-get-or-parse")
+
+    assert junit_cache.get_or_parse(f, parse, writer, {}) == _PARSED
+    parse.assert_called_once_with(f)
+    writer.index.assert_called_once_with(
+        junit_cache._INDEX,
+        dict(md5="md5-get-or-parse", created_at="2024", **_PARSED),
+        "md5-get-or-parse",
+        on_sent=mock.ANY,
+    )
+
+    # the same content attached to another file is not parsed again, even
+    # before its cache document is written
+    other_file = dict(f, id="f2")
+    assert junit_cache.get_or_parse(other_file, parse, writer, {}) == _PARSED
+    assert parse.call_count == 1
+
+    # nor when it was looked up in the cache
+    other_file = dict(f, md5="other")
+    cached = {"other": _PARSED}
+    assert junit_cache.get_or_parse(other_file, parse, writer, cached) == _PARSED
+    assert parse.call_count == 1
+    assert writer.index.call_count == 1
+
+    new_stats = junit_cache.get_stats()
+    assert new_stats["hits"] == stats["hits"] + 2
+    assert new_stats["misses"] == stats["misses"] + 1
+
+
+def test_get_or_parse_forgets_the_sent_files():
+    writer = mock.Mock()
+    parse = mock.Mock(return_value=_PARSED)
+    f = dict(_FILE, md5="md5-sent")
+    junit_cache.get_or_parse(f, parse, writer, {})
+    assert "md5-sent" in junit_cache._PARSED
+
+    # once written the parsed file is read from the index instead
+    writer.index.call_args[1]["on_sent"]()
+    assert "md5-sent" not in junit_cache._PARSED
+    assert "md5-sent" not in junit_cache._PARSED_SIZES
+    junit_cache.get_or_parse(f, parse, writer, {})
+    assert parse.call_count == 2
+
+
+@mock.patch.dict(config.CONFIG, {"JOBS_CACHE_JUNIT_MEMORY_MAX_SIZE": 100})
+def test_get_or_parse_bounds_the_parsed_files_size():
+    parse = mock.Mock(return_value=_PARSED)
+    for i in range(3):
+        f = dict(_FILE, md5="md5-size-%s" % i, size=40)
+        junit_cache.get_or_parse(f, parse, mock.Mock(), {})
+    assert "md5-size-0" not in junit_cache._PARSED
+    assert "md5-size-1" in junit_cache._PARSED
+    assert "md5-size-2" in junit_cache._PARSED
+
+    # a file larger than the bound is not kept once parsed
+    f = dict(_FILE, md5="md5-size-large", size=200)
+    junit_cache.get_or_parse(f, parse, mock.Mock(), {})
+    assert not [key for key in junit_cache._PARSED if key.startswith("md5-size")]
+
+
+def test_get_or_parse_retries_after_an_error():
+    parse = mock.Mock(side_effect=[Exception("download error"), _PARSED])
+    f = dict(_FILE, md5="md5-error")
+    try:
+        junit_cache.get_or_parse(f, parse, mock.Mock(), {})
+    except Exception:
+        pass
+    assert junit_cache.get_or_parse(f, parse, mock.Mock(), {}) == _PARSED
+    assert parse.call_count == 2
+
+
+def test_get_or_parse_concurrently():
+    parsing = threading.Event()
+    done = threading.Event()
+
+    def _parse(f):
+        parsing.set()
+        done.wait(5)
+        return _PARSED
+
+    results = []
+    waits = junit_cache.get_stats()["waits"]
+    parse = mock.Mock(side_effect=_parse)
+    f = dict(_FILE, md5="md5-concurrently")
+    owner = threading.Thread(
+        target=lambda: results.append(
+            junit_cache.get_or_parse(f, parse, mock.Mock(), {})
+        )
+    )
+    owner.start()
+    parsing.wait(5)
+    waiter = threading.Thread(
+        target=lambda: results.append(
+            junit_cache.get_or_parse(f, parse, mock.Mock(), {})
+        )
+    )
+    waiter.start()
+    while junit_cache.get_stats()["waits"] == waits:
+        time.sleep(0.01)
+    done.set()
+    owner.join()
+    waiter.join()
+    assert results == [_PARSED, _PARSED]
+    assert parse.call_count == 1
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+
+import pytest
+
+from dci_analytics import junit_parser
+
+JUNIT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- generated -->
+<testsuites>
+  <testsuite name="suite 1">
+    <properties>
+      <property name="platform" value="x86_64"/>
+      <property name=" " value="ignored"/>
+    </properties>
+    <testcase classname="c1" name="t1" time="1.5"/>
+    <testcase classname="c1" name="t2" time="bad">
+      <failure message="boom" type="AssertionError">trace</failure>
+    </testcase>
+    <!-- a comment -->
+    <testcase classname="c1,x" name="t3"><skipped/></testcase>
+    <testsuite name="nested">
+      <testcase classname="c2" name="t4" time="2"><error message="e"/></testcase>
+    </testsuite>
+    <testcase classname="c1" name="t5" time="0.5"/>
+  </testsuite>
+  <testsuite name="suite 2">
+    <testcase name="t6" time="3"/>
+  </testsuite>
+</testsuites>
+"""
+
+
+def _parse(content, backend):
+    return junit_parser.parse_junit_file(io.BytesIO(content), "f", backend)
+
+
+@pytest.mark.parametrize("backend", ["etree", "lxml"])
+def test_parse_junit_file_testsuites(backend):
+    testsuites = _parse(JUNIT, backend)["testsuites"]
+    assert [(ts["id"], ts["name"]) for ts in testsuites] == [
+        (0, "nested"),
+        (1, "suite 1"),
+        (2, "suite 2"),
+    ]
+    suite_1 = testsuites[1]
+    assert suite_1["properties"] == [{"name": "platform", "value": "x86_64"}]
+    assert [tc["name"] for tc in suite_1["testcases"]] == ["t1", "t2", "t3", "t5"]
+    assert (suite_1["tests"], suite_1["failures"], suite_1["skipped"]) == (4, 1, 1)
+    assert suite_1["time"] == 2.0
+
+
+def test_backends_produce_the_same_output():
+    assert _parse(JUNIT, "lxml") == _parse(JUNIT, "etree")
+
+
+@pytest.mark.parametrize("backend", ["etree", "lxml"])
+def test_parse_junit_file_durations(backend):
+    assert _parse(JUNIT, backend)["junit_content"] == {
+        "c1/t1": 1.5,
+        "c1/t2": -1.0,
+        "c1_x/t3": -1.0,
+        "c2/t4": 2.0,
+        "c1/t5": 0.5,
+    }
+
+
+@pytest.mark.parametrize("backend", ["etree", "lxml"])
+@pytest.mark.parametrize(
+    "content",
+    [b"", b"  \n", b"<!-- comment -->", b"<?xml version='1.0'?>\n", b"<a>text"],
+)
+def test_parse_junit_file_no_elements(backend, content):
+    assert _parse(content, backend) == {"testsuites": [], "junit_content": {}}
+
+
+@pytest.mark.parametrize("backend", ["etree", "lxml"])
+@pytest.mark.parametrize("content", [b"garbage", b"<a><b></a>", b"<a></a>junk"])
+def test_parse_junit_file_invalid(backend, content):
+    assert _parse(content, backend)["testsuites"] is None
+
+
+@pytest.mark.parametrize("backend", ["etree", "lxml"])
+def test_parse_junit_content(backend):
+    assert junit_parser.parse_junit_content(JUNIT, "f", backend) == _parse(
+        JUNIT, "etree"
+    )
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+from dci_analytics import local_cache
+
+
+def test_local_cache_get_set(tmp_path):
+    cache = local_cache.open_cache(str(tmp_path / "cache"), "tests", 1024 * 1024)
+    assert os.path.exists(str(tmp_path / "cache" / "tests.sqlite"))
+    assert cache.get("job1") is None
+    cache.set("job1", [{"name": "junit.xml", "testsuites": []}])
+    assert cache.get("job1") == [{"name": "junit.xml", "testsuites": []}]
+    cache.set("job1", [])
+    assert cache.get("job1") == []
+    cache.close()
+
+    cache = local_cache.open_cache(str(tmp_path / "cache"), "tests", 1024 * 1024)
+    assert cache.get("job1") == []
+    cache.close()
+
+
+def test_local_cache_evicts_the_least_recently_used(tmp_path):
+    value = [os.urandom(512).hex()]
+    cache = local_cache.LocalCache(str(tmp_path / "cache.sqlite"), 2000)
+    for key in ("job1", "job2", "job3"):
+        cache.set(key, value)
+    assert cache.get("job1") == value
+    cache.set("job4", value)
+    assert cache.size <= 2000
+    assert cache.get("job1") == value
+    assert cache.get("job2") is None
+    assert cache.get("job4") == value
+    cache.close()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) Red Hat, Inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import concurrent.futures
+
+import mock
+
+from dci_analytics import config
+from dci_analytics import worker as worker_module
+
+
+def _body(job_id, updated_at="2024-01-01T00:00:00"):
+    return {"event": "job_updated", "job": {"id": job_id, "updated_at": updated_at}}
+
+
+def _worker(batch_size=10, max_requeues=5):
+    with mock.patch.dict(
+        config.CONFIG,
+        {"WORKER_BATCH_SIZE": batch_size, "WORKER_MAX_REQUEUES": max_requeues},
+    ):
+        w = worker_module.Worker(mock.Mock(), [])
+    # the batches are synchronized when the test completes their future
+    w.batch_executor = mock.Mock()
+    w.batch_executor.submit.side_effect = lambda *args: concurrent.futures.Future()
+    return w
+
+
+def _sync(w, to_retry=None, exception=None):
+    """Submit the current batch and complete its synchronization."""
+    w.submit_batch()
+    future = w.pending_batches[-1][1]
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(to_retry or set())
+    w.ack_batches()
+
+
+def test_worker_acks_after_the_batch_write():
+    w = _worker(batch_size=2)
+    messages = [mock.Mock(), mock.Mock()]
+    w.on_message(_body("j1"), messages[0])
+    w.on_message(_body("j2"), messages[1])
+
+    # the batch is full and submitted, but not written yet
+    assert w.batch == {}
+    ((batch, future),) = w.pending_batches
+    w.batch_executor.submit.assert_called_once_with(
+        worker_module.sync_batch, [_body("j1")["job"], _body("j2")["job"]], w.executor
+    )
+    w.ack_batches()
+    assert not any(m.ack.called for m in messages)
+
+    future.set_result(set())
+    w.ack_batches()
+    for m in messages:
+        m.ack.assert_called_once_with()
+    assert w.pending_batches == []
+
+
+def test_worker_coalesces_the_job_events():
+    w = _worker()
+    messages = [mock.Mock() for _ in range(4)]
+    w.on_message(_body("j1", "2024-01-01T00:00:02"), messages[0])
+    w.on_message(_body("j1", "2024-01-01T00:00:03"), messages[1])
+    w.on_message(_body("j1", "2024-01-01T00:00:01"), messages[2])
+    w.on_message(_body("j2"), messages[3])
+    _sync(w)
+
+    # only the newest version of each job is synchronized
+    jobs_batch = w.batch_executor.submit.call_args[0][1]
+    assert jobs_batch == [
+        _body("j1", "2024-01-01T00:00:03")["job"],
+        _body("j2")["job"],
+    ]
+    for m in messages:
+        m.ack.assert_called_once_with()
+
+
+def test_worker_requeues_then_rejects_the_failed_jobs():
+    w = _worker(max_requeues=2)
+    for _ in range(2):
+        message = mock.Mock()
+        w.on_message(_body("j1"), message)
+        _sync(w, to_retry={"j1"})
+        message.requeue.assert_called_once_with()
+        assert not message.reject.called
+
+    # the requeues are exhausted, the job events are dropped
+    message = mock.Mock()
+    w.on_message(_body("j1"), message)
+    _sync(w, to_retry={"j1"})
+    message.reject.assert_called_once_with(requeue=False)
+    assert not message.requeue.called
+    assert w.requeues == {}
+
+
+def test_worker_requeues_the_batch_on_error():
+    w = _worker()
+    messages = [mock.Mock(), mock.Mock()]
+    w.on_message(_body("j1"), messages[0])
+    w.on_message(_body("j2"), messages[1])
+    _sync(w, exception=Exception("es is down"))
+    for m in messages:
+        m.requeue.assert_called_once_with()
+        assert not m.ack.called
+    assert w.requeues == {"j1": 1, "j2": 1}
+
+
+def test_worker_forgets_the_requeues_on_success():
+    w = _worker()
+    message = mock.Mock()
+    w.on_message(_body("j1"), message)
+    _sync(w, to_retry={"j1"})
+    assert w.requeues == {"j1": 1}
+
+    message = mock.Mock()
+    w.on_message(_body("j1"), message)
+    _sync(w)
+    message.ack.assert_called_once_with()
+    assert w.requeues == {}